@@ -243,18 +243,10 @@ const API_URL = 'https://bseu-pre-graduate-practice.onrender.com';
             loadDeposits();
         }
         
-        // Загрузка заявок
-        async function loadContactRequests() {
-            try {
-                const res = await fetch(`${API_URL}/api/contact-requests`);
-                const requests = await res.json();
-                
-                if (requests.length === 0) {
-                    document.getElementById('contactsList').innerHTML = '<p style="color: #999; text-align: center;">Нет заявок</p>';
-                    return;
-                }
-                
-                document.getElementById('contactsList').innerHTML = requests.map(req => `
+        let contactsCursor = null;
+        
+        function renderContactRequest(req) {
+            return `
                     <div class="loan-card">
                         <h3>📞 Заявка #${req.id}</h3>
                         <div class="loan-details">
@@ -272,9 +264,41 @@ const API_URL = 'https://bseu-pre-graduate-practice.onrender.com';
                         </div>
                         ` : ''}
                     </div>
-                `).join('');
+                `;
+        }
+        
+        // Загрузка заявок постранично: append=true дописывает следующую страницу
+        async function loadContactRequests(append = false) {
+            const list = document.getElementById('contactsList');
+            try {
+                const params = new URLSearchParams({limit: 50});
+                if (append && contactsCursor) params.set('cursor', contactsCursor);
+                
+                const res = await fetch(`${API_URL}/api/contact-requests?${params}`);
+                const data = await res.json();
+                
+                const moreBtn = document.getElementById('contactsMore');
+                if (moreBtn) moreBtn.remove();
+                
+                if (!append && data.items.length === 0) {
+                    list.innerHTML = '<p style="color: #999; text-align: center;">Нет заявок</p>';
+                    return;
+                }
+                
+                const html = data.items.map(renderContactRequest).join('');
+                if (append) {
+                    list.insertAdjacentHTML('beforeend', html);
+                } else {
+                    list.innerHTML = html;
+                }
+                
+                contactsCursor = data.next_cursor;
+                if (contactsCursor) {
+                    list.insertAdjacentHTML('beforeend',
+                        '<button id="contactsMore" class="btn" onclick="loadContactRequests(true)">⬇️ Загрузить ещё</button>');
+                }
             } catch (error) {
-                document.getElementById('contactsList').innerHTML = '<p style="color: #ff6b6b;">Ошибка загрузки</p>';
+                list.innerHTML = '<p style="color: #ff6b6b;">Ошибка загрузки</p>';
                 console.error(error);
             }
         }
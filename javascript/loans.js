@@ -181,4 +181,30 @@ document.addEventListener('DOMContentLoaded', function() {
             lastScrollTop = scrollTop;
         });
     }
-});
\ No newline at end of file
+});
+
+// Актуальные цифры на карточках из сводки каталога (один запрос, без списков продуктов)
+async function loadCatalogSummary() {
+    try {
+        const response = await fetch(`${window.location.origin}/api/catalog?summary=only`);
+        if (!response.ok) return;
+        const catalog = await response.json();
+        
+        document.querySelectorAll('.credit-card[data-section]').forEach(card => {
+            const summary = catalog.summary[card.dataset.section];
+            const amountEl = card.querySelector('.credit-amount');
+            if (!summary || !amountEl) return;
+            
+            if (card.dataset.summary === 'rate' && summary.min_rate !== null) {
+                amountEl.textContent = `от ${summary.min_rate}% годовых`;
+            } else if (summary.max_amount !== null) {
+                amountEl.textContent = `до ${summary.max_amount.toLocaleString('ru-RU')} BYN`;
+            }
+        });
+    } catch (error) {
+        // Оставляем цифры из разметки
+        console.error('Error loading catalog summary:', error);
+    }
+}
+
+document.addEventListener('DOMContentLoaded', loadCatalogSummary);
@@ -6,6 +6,20 @@ tg.ready();
 const API_URL = window.location.origin;
 console.log('API URL:', API_URL); // для отладки
 
+// Каталог, встроенный сервером в страницу (SSR): карточки рисуются без запроса к API
+const EMBEDDED_CATALOG = readEmbeddedCatalog();
+
+function readEmbeddedCatalog() {
+    const element = document.getElementById('catalog-data');
+    if (!element) return null;
+    try {
+        return JSON.parse(element.textContent);
+    } catch (error) {
+        console.error('Error parsing embedded catalog:', error);
+        return null;
+    }
+}
+
 document.addEventListener('DOMContentLoaded', async () => {
     await loadMortgageLoans();
     initMobileLogoScroll();
@@ -50,11 +64,14 @@ async function loadMortgageLoans() {
     const container = document.getElementById('loans-container');
     
     try {
-        const response = await fetch(`${API_URL}/api/mortgage-loans`);
+        let loans = EMBEDDED_CATALOG;
+        if (!loans) {
+            const response = await fetch(`${API_URL}/api/mortgage-loans`);
         
-        if (!response.ok) throw new Error('Ошибка загрузки данных');
+            if (!response.ok) throw new Error('Ошибка загрузки данных');
         
-        const loans = await response.json();
+            loans = await response.json();
+        }
         
         if (loans.length === 0) {
             container.innerHTML = '<div class="error-message">Кредиты временно недоступны</div>';
@@ -111,10 +128,13 @@ async function showLoanDetails(loanId) {
     const modalContent = document.getElementById('modalContent');
     
     try {
-        const response = await fetch(`${API_URL}/api/mortgage-loans/${loanId}`);
-        if (!response.ok) throw new Error('Кредит не найден');
+        let loan = EMBEDDED_CATALOG?.find(item => item.id === loanId);
+        if (!loan) {
+            const response = await fetch(`${API_URL}/api/mortgage-loans/${loanId}`);
+            if (!response.ok) throw new Error('Кредит не найден');
         
-        const loan = await response.json();
+            loan = await response.json();
+        }
         
         modalContent.innerHTML = `
             <h2 style="color: #ffffff; margin-bottom: 20px;">${loan.name}</h2>
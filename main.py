@@ -77,20 +77,31 @@ def is_admin(user_id):
     """Проверяет, является ли пользователь администратором"""
     return user_id == ADMIN_USER_ID
 
-def get_unprocessed_requests():
-    """Получает количество необработанных заявок из API"""
+def get_requests_stats():
+    """Получает сводку по заявкам из API (счётчики считает сервер)"""
     try:
-        response = requests.get(f"{WEB_APP_URL}/api/contact-requests", timeout=5)
+        response = requests.get(f"{WEB_APP_URL}/api/contact-requests/stats", timeout=5)
         if response.status_code == 200:
-            requests_data = response.json()
-            # Считаем заявки со статусом 'new'
-            unprocessed = sum(1 for req in requests_data if req.get('status') == 'new')
-            return unprocessed, len(requests_data)
-        else:
-            return None, None
+            stats = response.json()
+            if 'total' in stats:
+                return stats
+        return None
     except Exception as e:
         print(f"Ошибка получения заявок: {e}")
-        return None, None
+        return None
+
+def format_age(seconds):
+    """Возраст заявки в читаемом виде: 2 д 3 ч / 3 ч 15 мин / 5 мин"""
+    if seconds is None:
+        return "—"
+    minutes = int(seconds) // 60
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days} д {hours} ч"
+    if hours:
+        return f"{hours} ч {minutes} мин"
+    return f"{minutes} мин"
 
 @bot.message_handler(commands=['start', 'help'])
 def send_welcome(message):
@@ -138,9 +149,9 @@ def status_command(message):
     status_msg = bot.reply_to(message, "⏳ **Получаю данные о заявках...**", parse_mode='Markdown')
     
     # Получаем данные из API
-    unprocessed, total = get_unprocessed_requests()
+    stats = get_requests_stats()
     
-    if unprocessed is None:
+    if stats is None:
         bot.edit_message_text(
             "❌ **Ошибка подключения к API.**\n\n"
             "Не удалось получить данные о заявках.\n"
@@ -159,13 +170,16 @@ def status_command(message):
     )
     markup.add(admin_btn)
     
+    unprocessed = stats['unprocessed']
     status_text = (
         "📊 **СТАТИСТИКА ЗАЯВОК**\n\n"
         f"👑 Администратор: @{message.from_user.username}\n\n"
         "**📌 Текущий статус:**\n"
         f"• 🆕 **Необработанных заявок:** `{unprocessed}`\n"
-        f"• 📦 **Всего заявок:** `{total}`\n\n"
+        f"• 📦 **Всего заявок:** `{stats['total']}`\n\n"
         "**📈 Детализация:**\n"
+        f"• 📅 За сегодня: `{stats['today']}`, за неделю: `{stats['week']}`\n"
+        f"• ⏳ Самая старая необработанная: `{format_age(stats['oldest_unprocessed_age_seconds'])}`\n"
         f"• {'🔴 Требуют внимания!' if unprocessed > 0 else '✅ Все заявки обработаны'}"
     )
     
@@ -233,9 +247,9 @@ def status_callback(call):
         return
     
     # Получаем данные
-    unprocessed, total = get_unprocessed_requests()
+    stats = get_requests_stats()
     
-    if unprocessed is None:
+    if stats is None:
         bot.answer_callback_query(
             call.id,
             "❌ Ошибка подключения к API",
@@ -243,10 +257,12 @@ def status_callback(call):
         )
         return
     
+    unprocessed = stats['unprocessed']
     status_text = (
         f"📊 СТАТИСТИКА ЗАЯВОК\n\n"
         f"• 🆕 Необработанных: {unprocessed}\n"
-        f"• 📦 Всего заявок: {total}\n"
+        f"• 📦 Всего заявок: {stats['total']}\n"
+        f"• 📅 За сегодня: {stats['today']}\n"
         f"• {'🔴 Требуют внимания!' if unprocessed > 0 else '✅ Все хорошо'}"
     )
     
@@ -344,9 +360,9 @@ def handle_reply_buttons(message):
             return
         
         # Используем ту же логику, что и в /status
-        unprocessed, total = get_unprocessed_requests()
+        stats = get_requests_stats()
         
-        if unprocessed is None:
+        if stats is None:
             bot.send_message(
                 message.chat.id,
                 "❌ **Ошибка подключения к API**",
@@ -361,10 +377,13 @@ def handle_reply_buttons(message):
         )
         markup.add(admin_btn)
         
+        unprocessed = stats['unprocessed']
         status_text = (
             "📊 **СТАТИСТИКА ЗАЯВОК**\n\n"
             f"• 🆕 **Необработанных:** `{unprocessed}`\n"
-            f"• 📦 **Всего заявок:** `{total}`\n\n"
+            f"• 📦 **Всего заявок:** `{stats['total']}`\n"
+            f"• 📅 **За сегодня:** `{stats['today']}`\n"
+            f"• ⏳ **Старейшая необработанная:** `{format_age(stats['oldest_unprocessed_age_seconds'])}`\n\n"
             f"**Статус:** {'🔴 Требуют внимания!' if unprocessed > 0 else '✅ Все обработаны'}"
         )
         
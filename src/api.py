@@ -1,26 +1,83 @@
-from fastapi import FastAPI, Response, HTTPException
+from fastapi import Body, FastAPI, Query, Request, Response, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from contextlib import AsyncExitStack, asynccontextmanager
+from pydantic import BaseModel, ValidationError
 from sqlalchemy import text
+from datetime import datetime
+from typing import Annotated
 import os
 import sys
 import json
+import base64
+import csv
+import asyncio
+import hashlib
+import io
 import traceback
+import numpy as np
+import orjson
 import uvicorn
 
 # ===========================================
 # ИМПОРТЫ ИЗ ПРОЕКТА
 # ===========================================
 sys.path.append(os.path.dirname(__file__))
-from database import async_session_factory
+from config import settings
+from database import async_engine, async_session_factory, pool_status, sync_engine
+from cache import catalog_cache, etag_matches, recent_contacts, table_versions
+from assets import asset_response
+from calculator import MAX_TERM_MONTHS, capitalization_periods, loan_calculator, project_deposits
+from contact_queue import contact_queue
+from importer import IMPORT_FORMATS, IMPORT_TABLES, import_stream
+from matching import PURPOSES, match_index
+from ratelimit import RateLimitMiddleware, rate_limiter
+from pages import PAGES, page_registry, serve_page
+from parsers import numeric_columns, parse_amount, parse_rate, product_numbers
+from responses import ORJSONResponse, encoded_bodies, encoded_response
+from repository import (
+    contact_stats, delete_by_id, delete_many, ensure_table, insert_contact, insert_returning_id, lock_contact_key,
+    prefix_tsquery, search_products,
+    select_advantage_facets, select_all, select_all_json, select_by_id, select_contacts, select_contacts_json,
+    select_products, select_recent_contact,
+    select_unparsed, update_numeric, LOAN_TABLES, TABLES,
+)
+from schemas import (
+    BulkDelete, ContactRequest, DepositCreate, LoanCalculation, LoanCreate, ProductFilters,
+    DEPOSIT_NUMERIC_COLUMNS, LOAN_NUMERIC_COLUMNS,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Прогрев до приёма запросов; если БД недоступна - повторы в фоне"""
+    app.state.ready = False
+    retry_task = None
+    page_registry.reload()
+    if settings.CONTACT_QUEUE_ENABLED:
+        await contact_queue.start()
+    if settings.WARMUP_ENABLED:
+        if not await warmup(app):
+            retry_task = asyncio.create_task(warmup_until_ready(app))
+    else:
+        app.state.ready = True
+    yield
+    if retry_task:
+        retry_task.cancel()
+    if settings.CONTACT_QUEUE_ENABLED:
+        await contact_queue.stop()
+    await async_engine.dispose()
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+app.state.ready = False
 
 # ===========================================
 # НАСТРОЙКА CORS
 # ===========================================
+# Добавлен раньше CORS - значит, внутри него: ответ 429 тоже получает CORS-заголовки
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -29,74 +86,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ===========================================
-# МОДЕЛИ ДАННЫХ
-# ===========================================
-
-class LoanCreate(BaseModel):
-    name: str
-    rate: str
-    term: str
-    amount: str
-    advantage: list[str]
-    details: str
-
-class DepositCreate(BaseModel):
-    name: str
-    rate: str
-    term: str
-    min_amount: str
-    max_amount: str
-    capitalization: str = "Ежемесячно"
-    advantage: list[str]  # JSONB поле
-    details: str
-
-class ContactRequest(BaseModel):
-    telegram_id: int
-    username: str = ""
-    first_name: str = ""
-    last_name: str = ""
-
 # ===========================================
 # ОТДАЧА HTML СТРАНИЦ
 # ===========================================
 
-@app.get("/")
-async def serve_index():
-    return FileResponse("index.html")
-
-@app.get("/index.html")
-async def serve_index_html():
-    return FileResponse("index.html")
-
-@app.get("/loans.html")
-async def serve_loans():
-    return FileResponse("loans.html")
-
-@app.get("/consumer_loans.html")
-async def serve_consumer_loans():
-    return FileResponse("consumer_loans.html")
-
-@app.get("/mortgage_loans.html")
-async def serve_mortgage_loans():
-    return FileResponse("mortgage_loans.html")
-
-@app.get("/preferential_loans.html")
-async def serve_preferential_loans():
-    return FileResponse("preferential_loans.html")
-
-@app.get("/deposits.html")
-async def serve_deposits():
-    return FileResponse("deposits.html")
-
-@app.get("/admin.html")
-async def serve_admin():
-    return FileResponse("admin.html")
+# Один обработчик на все страницы: HTML из памяти (pages.page_registry)
+for page_route in PAGES:
+    app.add_api_route(page_route, serve_page, methods=["GET"])
 
 # ===========================================
 # СТАТИЧЕСКИЕ ФАЙЛЫ
 # ===========================================
 
+@app.get("/assets/{asset_path:path}")
+async def serve_asset(asset_path: str, request: Request):
+    """Собранная статика (python src/assets.py): имя с хэшем, кэш навсегда"""
+    return asset_response(asset_path, request.headers.get("accept-encoding"))
+
+# Исходники статики - для запуска без сборки
 app.mount("/style", StaticFiles(directory="style"), name="style")
 app.mount("/javascript", StaticFiles(directory="javascript"), name="javascript")
 app.mount("/img", StaticFiles(directory="img"), name="img")
@@ -105,21 +112,37 @@ app.mount("/img", StaticFiles(directory="img"), name="img")
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # ===========================================
 
-async def create_loan_table(table_name: str):
-    """Общая функция для создания таблиц с JSONB полем advantage"""
-    async with async_session_factory() as session:
-        await session.execute(text(f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                id SERIAL PRIMARY KEY,
-                name VARCHAR(100) NOT NULL,
-                rate VARCHAR(50) NOT NULL,
-                term VARCHAR(50) NOT NULL,
-                amount VARCHAR(50) NOT NULL,
-                advantage JSONB NOT NULL DEFAULT '[]'::jsonb,
-                details TEXT NOT NULL
-            )
-        """))
-        await session.commit()
+async def create_table(table_name: str):
+    """CREATE TABLE IF NOT EXISTS (с индексами) по описанию таблицы из models.py"""
+    async with async_engine.begin() as conn:
+        await conn.run_sync(ensure_table, table_name)
+    if table_name in NUMERIC_COLUMNS:
+        await backfill_numeric_columns(table_name)
+
+# Таблица продуктов -> числовые колонки, вычисляемые из строк отображения
+NUMERIC_COLUMNS = {
+    "consumer_loans": LOAN_NUMERIC_COLUMNS,
+    "mortgage_loans": LOAN_NUMERIC_COLUMNS,
+    "preferential_loans": LOAN_NUMERIC_COLUMNS,
+    "deposits": DEPOSIT_NUMERIC_COLUMNS,
+}
+
+async def backfill_numeric_columns(table_name: str) -> int:
+    """Заполнить числовые колонки у строк, добавленных в обход API (старые данные, сиды)"""
+    columns = NUMERIC_COLUMNS[table_name]
+    async with async_engine.begin() as conn:
+        rows = (await conn.execute(select_unparsed(table_name, columns))).mappings().all()
+        updates = [{"row_id": row["id"], **numeric_columns(dict(row))} for row in rows]
+        if updates:
+            await conn.execute(update_numeric(table_name, columns), updates)
+    if updates:
+        catalog_cache.invalidate(table_name)
+    return len(updates)
+
+def product_values(product: BaseModel) -> dict:
+    """Параметры INSERT для кредита/вклада вместе с числовыми колонками"""
+    row = product.model_dump()
+    return {**row, **numeric_columns(row)}
 
 def safe_json_loads(data):
     """Безопасно загружает JSON, возвращает список"""
@@ -134,6 +157,214 @@ def safe_json_loads(data):
             return [data]
     return [str(data)]
 
+def not_modified(request: Request, etag: str):
+    """Ответ 304 без тела, если у клиента уже есть эта версия данных"""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+def set_etag(response: Response, etag: str):
+    """ETag + обязательная перепроверка: браузер хранит ответ, но спрашивает сервер"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+async def catalog_list(table_name: str, loader, request: Request, response: Response):
+    """Список продуктов из кэша каталога с поддержкой If-None-Match"""
+    etag = catalog_cache.etag(table_name)
+    if catalog_cache.is_fresh(table_name):
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+    
+    items = await loader()
+    
+    # Без актуальной записи в кэше (ошибка БД, TTL=0) версии не доверяем. Если
+    # версия сменилась во время загрузки, items могут быть старше новой версии
+    if catalog_cache.is_fresh(table_name) and catalog_cache.etag(table_name) == etag:
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        # Тело для этой версии таблицы сериализуется один раз
+        return encoded_response(request, etag, lambda: items)
+    return items
+
+async def catalog_item(table_name: str, item_id: int, loader, request: Request, response: Response, not_found: str):
+    """Продукт по ID с ETag по версии его таблицы"""
+    fresh = catalog_cache.is_fresh(table_name)
+    etag = catalog_cache.etag(table_name, "id", item_id)
+    if fresh:
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+    
+    item = await loader()
+    if not item:
+        raise HTTPException(status_code=404, detail=not_found)
+    
+    # Таблицу могли изменить, пока шёл запрос - тогда ETag не ставим
+    if fresh and catalog_cache.is_fresh(table_name) and catalog_cache.etag(table_name, "id", item_id) == etag:
+        set_etag(response, etag)
+    return item
+
+async def fetch_filtered(table_name: str, filters: ProductFilters):
+    """Продукты по фильтрам числовых колонок и преимуществам (запрос в БД, без кэша)"""
+    params = filters.params()
+    query = select_products(
+        table_name, "max_rate" in params, "min_amount" in params, "term_months" in params, filters.sort,
+        has_advantage="advantage" in params,
+    )
+    async with async_session_factory() as session:
+        result = await session.execute(query, params)
+        rows = result.mappings().all()
+    items = []
+    for row in rows:
+        item = dict(row)
+        item["advantage"] = safe_json_loads(item.get("advantage"))
+        items.append(item)
+    return items
+
+async def catalog_filtered(table_name: str, filters: ProductFilters, request: Request, response: Response):
+    """Отфильтрованный список с ETag по версии таблицы и параметрам запроса"""
+    fresh = catalog_cache.is_fresh(table_name)
+    etag = catalog_cache.etag(table_name, query_fingerprint(request))
+    if fresh:
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+    
+    try:
+        items = await fetch_filtered(table_name, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error in catalog_filtered for {table_name}: {e}")
+        traceback.print_exc()
+        return []
+    
+    if fresh and catalog_cache.is_fresh(table_name) and catalog_cache.etag(table_name, query_fingerprint(request)) == etag:
+        set_etag(response, etag)
+    return items
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Курсор страницы заявок: позиция (created_at, id) последней строки"""
+    raw = json.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Разобрать курсор, выданный encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+def local_naive(value: datetime | None) -> datetime | None:
+    """Дата с часовым поясом -> местное время без пояса (created_at - TIMESTAMP без зоны)"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+def contact_filters(status: str | None = None, telegram_id: int | None = None,
+                    date_from: datetime | None = None, date_to: datetime | None = None) -> dict:
+    """Параметры фильтров выборок заявок (только заданные)"""
+    params = {
+        "status": status, "telegram_id": telegram_id,
+        "date_from": local_naive(date_from), "date_to": local_naive(date_to),
+    }
+    return {key: value for key, value in params.items() if value is not None}
+
+def contacts_query(params: dict, keyset: bool = False, newest_first: bool = True):
+    """Готовый SELECT заявок под набор заданных фильтров"""
+    return select_contacts(
+        "status" in params, "telegram_id" in params, "date_from" in params, "date_to" in params,
+        keyset=keyset, newest_first=newest_first
+    )
+
+def json_default(value):
+    """Сериализация datetime и прочего для json.dumps"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def query_fingerprint(request: Request) -> str:
+    """Короткий хэш параметров запроса (для ETag выборок с фильтрами)"""
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    return hashlib.md5(query.encode()).hexdigest()[:12]
+
+# ===========================================
+# ПАКЕТНЫЕ ОПЕРАЦИИ (BULK)
+# ===========================================
+
+def validate_items(model, items: list):
+    """Проверить элементы пакета по одному: [(индекс, объект)], [ошибки по индексам]"""
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as e:
+            errors.append({"index": index, "errors": e.errors(include_url=False, include_context=False, include_input=False)})
+    return valid, errors
+
+async def bulk_insert(table_name: str, rows: list[dict]) -> list[int]:
+    """INSERT ... RETURNING id со списком строк в одной транзакции
+
+    SQLAlchemy сам режет список на многострочные VALUES по лимиту параметров
+    и возвращает id в порядке строк.
+    """
+    async with async_session_factory() as session:
+        result = await session.execute(insert_returning_id(table_name), rows)
+        ids = result.scalars().all()
+        await session.commit()
+    return ids
+
+async def bulk_create(table_name: str, model, items: list):
+    """Пакетное добавление продуктов: невалидные элементы пропускаются и попадают в errors"""
+    if len(items) > settings.BULK_MAX_ITEMS:
+        return {"status": "error", "message": f"❌ Не больше {settings.BULK_MAX_ITEMS} элементов за запрос"}
+    
+    valid, errors = validate_items(model, items)
+    try:
+        ids = await bulk_insert(table_name, [product_values(obj) for _, obj in valid]) if valid else []
+    except Exception as e:
+        print(f"Error in bulk_create for {table_name}: {e}")
+        traceback.print_exc()
+        return {"status": "error", "message": str(e), "errors": errors}
+    
+    if ids:
+        catalog_cache.invalidate(table_name)
+    return {
+        "status": "success" if not errors else "partial",
+        "message": f"✅ Добавлено: {len(ids)}, с ошибками: {len(errors)}",
+        "created": len(ids),
+        "ids": [{"index": index, "id": new_id} for (index, _), new_id in zip(valid, ids)],
+        "errors": errors
+    }
+
+async def bulk_delete(table_name: str, ids: list[int]):
+    """Пакетное удаление по списку ID одним запросом"""
+    if len(ids) > settings.BULK_MAX_ITEMS:
+        return {"status": "error", "message": f"❌ Не больше {settings.BULK_MAX_ITEMS} элементов за запрос"}
+    
+    try:
+        async with async_session_factory() as session:
+            result = await session.execute(delete_many(table_name), {"ids": ids})
+            deleted = set(result.scalars().all())
+            await session.commit()
+    except Exception as e:
+        print(f"Error in bulk_delete for {table_name}: {e}")
+        return {"status": "error", "message": str(e)}
+    
+    if deleted:
+        catalog_cache.invalidate(table_name)
+    not_found = [item_id for item_id in ids if item_id not in deleted]
+    return {
+        "status": "success" if not not_found else "partial",
+        "message": f"✅ Удалено: {len(deleted)}",
+        "deleted": sorted(deleted),
+        "not_found": not_found
+    }
+
 # ===========================================
 # УПРАВЛЕНИЕ БАЗОЙ ДАННЫХ (СОЗДАНИЕ ТАБЛИЦ)
 # ===========================================
@@ -142,7 +373,7 @@ def safe_json_loads(data):
 async def create_tables():
     """Создать таблицу consumer_loans с JSONB"""
     try:
-        await create_loan_table("consumer_loans")
+        await create_table("consumer_loans")
         return {"status": "success", "message": "✅ Таблица consumer_loans создана с поддержкой JSONB!"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -151,7 +382,7 @@ async def create_tables():
 async def create_mortgage_table():
     """Создать таблицу mortgage_loans с JSONB"""
     try:
-        await create_loan_table("mortgage_loans")
+        await create_table("mortgage_loans")
         return {"status": "success", "message": "✅ Таблица mortgage_loans создана с поддержкой JSONB!"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -160,7 +391,7 @@ async def create_mortgage_table():
 async def create_preferential_table():
     """Создать таблицу preferential_loans с JSONB"""
     try:
-        await create_loan_table("preferential_loans")
+        await create_table("preferential_loans")
         return {"status": "success", "message": "✅ Таблица preferential_loans создана с поддержкой JSONB!"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -169,43 +400,17 @@ async def create_preferential_table():
 async def create_deposits_table():
     """Создать таблицу для вкладов с JSONB полем advantage"""
     try:
-        async with async_session_factory() as session:
-            await session.execute(text("""
-                CREATE TABLE IF NOT EXISTS deposits (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(100) NOT NULL,
-                    rate VARCHAR(50) NOT NULL,
-                    term VARCHAR(50) NOT NULL,
-                    min_amount VARCHAR(50) NOT NULL,
-                    max_amount VARCHAR(50) NOT NULL,
-                    capitalization VARCHAR(50) DEFAULT 'Ежемесячно',
-                    advantage JSONB NOT NULL DEFAULT '[]'::jsonb,
-                    details TEXT NOT NULL
-                )
-            """))
-            await session.commit()
-            return {"status": "success", "message": "✅ Таблица deposits создана с JSONB!"}
+        await create_table("deposits")
+        return {"status": "success", "message": "✅ Таблица deposits создана с JSONB!"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 @app.get("/api/create-contacts-table")
 async def create_contacts_table():
-    """Создать таблицу для заявок"""
+    """Создать таблицу для заявок (с индексами под админку)"""
     try:
-        async with async_session_factory() as session:
-            await session.execute(text("""
-                CREATE TABLE IF NOT EXISTS contact_requests (
-                    id SERIAL PRIMARY KEY,
-                    telegram_id BIGINT NOT NULL,
-                    username VARCHAR(255),
-                    first_name VARCHAR(255),
-                    last_name VARCHAR(255),
-                    created_at TIMESTAMP DEFAULT NOW(),
-                    status VARCHAR(50) DEFAULT 'new'
-                )
-            """))
-            await session.commit()
-            return {"status": "success", "message": "✅ Таблица contact_requests создана!"}
+        await create_table("contact_requests")
+        return {"status": "success", "message": "✅ Таблица contact_requests создана!"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -242,6 +447,8 @@ async def seed_database():
                     "adv3": json.dumps(["Объедините несколько кредитов", "Снижение платежа", "Увеличение срока"])
                 })
                 await session.commit()
+                await backfill_numeric_columns("consumer_loans")
+                catalog_cache.invalidate("consumer_loans")
                 return {"status": "success", "message": "✅ Тестовые потребительские кредиты добавлены с JSONB!", "count": 3}
             else:
                 return {"status": "info", "message": f"ℹ️ В таблице уже есть {count} записей", "count": count}
@@ -279,6 +486,8 @@ async def seed_mortgage():
                     "adv3": json.dumps(["С возможностью покупки участка", "Длительный срок", "Индивидуальные условия"])
                 })
                 await session.commit()
+                await backfill_numeric_columns("mortgage_loans")
+                catalog_cache.invalidate("mortgage_loans")
                 return {"status": "success", "message": "✅ Тестовые ипотечные кредиты добавлены с JSONB!", "count": 3}
             else:
                 return {"status": "info", "message": f"ℹ️ В таблице уже есть {count} записей"}
@@ -321,6 +530,8 @@ async def seed_preferential():
                     "adv4": json.dumps(["Государственная поддержка", "Длительный срок", "Субсидии"])
                 })
                 await session.commit()
+                await backfill_numeric_columns("preferential_loans")
+                catalog_cache.invalidate("preferential_loans")
                 return {"status": "success", "message": "✅ Тестовые льготные кредиты добавлены с JSONB!", "count": 4}
             else:
                 return {"status": "info", "message": f"ℹ️ В таблице уже есть {count} записей"}
@@ -363,6 +574,8 @@ async def seed_deposits():
                     "adv4": json.dumps(["Оптимальный выбор", "Сбалансированные условия", "Надежность"])
                 })
                 await session.commit()
+                await backfill_numeric_columns("deposits")
+                catalog_cache.invalidate("deposits")
                 return {"status": "success", "message": "✅ Тестовые вклады добавлены с JSONB!", "count": 4}
             else:
                 return {"status": "info", "message": f"ℹ️ В таблице уже есть {count} записей"}
@@ -375,22 +588,35 @@ async def seed_deposits():
 # ВСПОМОГАТЕЛЬНАЯ ФУНКЦИЯ ДЛЯ ПОЛУЧЕНИЯ КРЕДИТОВ
 # ===========================================
 
+async def fetch_json_rows(table_name: str):
+    """Вся таблица JSON-массивом, собранным в PostgreSQL (DB_JSON_AGG)
+
+    Вместо dict(row) и разбора advantage по строкам - один orjson.loads.
+    """
+    async with async_session_factory() as session:
+        raw = (await session.execute(select_all_json(table_name))).scalar_one()
+    return orjson.loads(raw)
+
+async def fetch_loans(table_name: str):
+    """Прочитать все кредиты из таблицы (без кэша)"""
+    if settings.DB_JSON_AGG:
+        return await fetch_json_rows(table_name)
+    async with async_session_factory() as session:
+        result = await session.execute(select_all(table_name))
+        rows = result.mappings().all()
+        
+        loans = []
+        for row in rows:
+            loan_dict = dict(row)
+            loan_dict["advantage"] = safe_json_loads(loan_dict.get("advantage"))
+            loans.append(loan_dict)
+        
+        return loans
+
 async def get_loans(table_name: str):
-    """Общая функция для получения кредитов из любой таблицы"""
+    """Общая функция для получения кредитов из любой таблицы (через кэш каталога)"""
     try:
-        async with async_session_factory() as session:
-            result = await session.execute(
-                text(f"SELECT id, name, rate, term, amount, advantage, details FROM {table_name} ORDER BY id")
-            )
-            rows = result.mappings().all()
-            
-            loans = []
-            for row in rows:
-                loan_dict = dict(row)
-                loan_dict["advantage"] = safe_json_loads(loan_dict.get("advantage"))
-                loans.append(loan_dict)
-            
-            return loans
+        return await catalog_cache.get(table_name, lambda: fetch_loans(table_name))
     except Exception as e:
         print(f"Error in get_loans for {table_name}: {e}")
         traceback.print_exc()
@@ -400,10 +626,7 @@ async def get_loan_by_id(table_name: str, loan_id: int):
     """Общая функция для получения кредита по ID"""
     try:
         async with async_session_factory() as session:
-            result = await session.execute(
-                text(f"SELECT * FROM {table_name} WHERE id = :id"),
-                {"id": loan_id}
-            )
+            result = await session.execute(select_by_id(table_name), {"id": loan_id})
             row = result.mappings().first()
             if not row:
                 return None
@@ -420,37 +643,28 @@ async def get_loan_by_id(table_name: str, loan_id: int):
 # ===========================================
 
 @app.get("/api/consumer-loans")
-async def get_all_consumer_loans():
-    """Получить все потребительские кредиты"""
-    return await get_loans("consumer_loans")
+async def get_all_consumer_loans(request: Request, response: Response, filters: Annotated[ProductFilters, Query()]):
+    """Получить все потребительские кредиты (max_rate, min_amount, term_months, sort - фильтры в БД)"""
+    if filters.is_set():
+        return await catalog_filtered("consumer_loans", filters, request, response)
+    return await catalog_list("consumer_loans", lambda: get_loans("consumer_loans"), request, response)
 
 @app.get("/api/consumer-loans/{loan_id}")
-async def get_consumer_loan(loan_id: int):
+async def get_consumer_loan(loan_id: int, request: Request, response: Response):
     """Получить потребительский кредит по ID"""
-    loan = await get_loan_by_id("consumer_loans", loan_id)
-    if not loan:
-        raise HTTPException(status_code=404, detail="Кредит не найден")
-    return loan
+    return await catalog_item(
+        "consumer_loans", loan_id, lambda: get_loan_by_id("consumer_loans", loan_id),
+        request, response, "Кредит не найден"
+    )
 
 @app.post("/api/consumer-loans")
 async def create_consumer_loan(loan: LoanCreate):
     """Добавить новый потребительский кредит"""
     try:
         async with async_session_factory() as session:
-            advantages_json = json.dumps(loan.advantage, ensure_ascii=False)
-            
-            await session.execute(text("""
-                INSERT INTO consumer_loans (name, rate, term, amount, advantage, details)
-                VALUES (:name, :rate, :term, :amount, :advantage, :details)
-            """), {
-                "name": loan.name,
-                "rate": loan.rate,
-                "term": loan.term,
-                "amount": loan.amount,
-                "advantage": advantages_json,
-                "details": loan.details
-            })
+            await session.execute(insert_returning_id("consumer_loans"), product_values(loan))
             await session.commit()
+            catalog_cache.invalidate("consumer_loans")
             return {"status": "success", "message": "✅ Потребительский кредит успешно добавлен"}
     except Exception as e:
         print(f"Error in create_consumer_loan: {e}")
@@ -462,10 +676,9 @@ async def delete_consumer_loan(loan_id: int):
     """Удалить потребительский кредит"""
     try:
         async with async_session_factory() as session:
-            result = await session.execute(text("""
-                DELETE FROM consumer_loans WHERE id = :id
-            """), {"id": loan_id})
+            result = await session.execute(delete_by_id("consumer_loans"), {"id": loan_id})
             await session.commit()
+            catalog_cache.invalidate("consumer_loans")
             
             if result.rowcount == 0:
                 return {"status": "error", "message": "❌ Кредит не найден"}
@@ -474,42 +687,43 @@ async def delete_consumer_loan(loan_id: int):
         print(f"Error in delete_consumer_loan: {e}")
         return {"status": "error", "message": str(e)}
 
+@app.post("/api/consumer-loans/bulk")
+async def bulk_create_consumer_loans(items: list = Body(...)):
+    """Пакетно добавить потребительские кредиты"""
+    return await bulk_create("consumer_loans", LoanCreate, items)
+
+@app.post("/api/consumer-loans/bulk-delete")
+async def bulk_delete_consumer_loans(payload: BulkDelete):
+    """Пакетно удалить потребительские кредиты по списку ID"""
+    return await bulk_delete("consumer_loans", payload.ids)
+
 # ===========================================
 # API ДЛЯ ИПОТЕЧНЫХ КРЕДИТОВ
 # ===========================================
 
 @app.get("/api/mortgage-loans")
-async def get_all_mortgage_loans():
-    """Получить все ипотечные кредиты"""
-    return await get_loans("mortgage_loans")
+async def get_all_mortgage_loans(request: Request, response: Response, filters: Annotated[ProductFilters, Query()]):
+    """Получить все ипотечные кредиты (max_rate, min_amount, term_months, sort - фильтры в БД)"""
+    if filters.is_set():
+        return await catalog_filtered("mortgage_loans", filters, request, response)
+    return await catalog_list("mortgage_loans", lambda: get_loans("mortgage_loans"), request, response)
 
 @app.get("/api/mortgage-loans/{loan_id}")
-async def get_mortgage_loan(loan_id: int):
+async def get_mortgage_loan(loan_id: int, request: Request, response: Response):
     """Получить ипотечный кредит по ID"""
-    loan = await get_loan_by_id("mortgage_loans", loan_id)
-    if not loan:
-        raise HTTPException(status_code=404, detail="Кредит не найден")
-    return loan
+    return await catalog_item(
+        "mortgage_loans", loan_id, lambda: get_loan_by_id("mortgage_loans", loan_id),
+        request, response, "Кредит не найден"
+    )
 
 @app.post("/api/mortgage-loans")
 async def create_mortgage_loan(loan: LoanCreate):
     """Добавить новый ипотечный кредит"""
     try:
         async with async_session_factory() as session:
-            advantages_json = json.dumps(loan.advantage, ensure_ascii=False)
-            
-            await session.execute(text("""
-                INSERT INTO mortgage_loans (name, rate, term, amount, advantage, details)
-                VALUES (:name, :rate, :term, :amount, :advantage, :details)
-            """), {
-                "name": loan.name,
-                "rate": loan.rate,
-                "term": loan.term,
-                "amount": loan.amount,
-                "advantage": advantages_json,
-                "details": loan.details
-            })
+            await session.execute(insert_returning_id("mortgage_loans"), product_values(loan))
             await session.commit()
+            catalog_cache.invalidate("mortgage_loans")
             return {"status": "success", "message": "✅ Ипотечный кредит успешно добавлен"}
     except Exception as e:
         print(f"Error in create_mortgage_loan: {e}")
@@ -521,10 +735,9 @@ async def delete_mortgage_loan(loan_id: int):
     """Удалить ипотечный кредит"""
     try:
         async with async_session_factory() as session:
-            result = await session.execute(text("""
-                DELETE FROM mortgage_loans WHERE id = :id
-            """), {"id": loan_id})
+            result = await session.execute(delete_by_id("mortgage_loans"), {"id": loan_id})
             await session.commit()
+            catalog_cache.invalidate("mortgage_loans")
             
             if result.rowcount == 0:
                 return {"status": "error", "message": "❌ Кредит не найден"}
@@ -532,42 +745,43 @@ async def delete_mortgage_loan(loan_id: int):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.post("/api/mortgage-loans/bulk")
+async def bulk_create_mortgage_loans(items: list = Body(...)):
+    """Пакетно добавить ипотечные кредиты"""
+    return await bulk_create("mortgage_loans", LoanCreate, items)
+
+@app.post("/api/mortgage-loans/bulk-delete")
+async def bulk_delete_mortgage_loans(payload: BulkDelete):
+    """Пакетно удалить ипотечные кредиты по списку ID"""
+    return await bulk_delete("mortgage_loans", payload.ids)
+
 # ===========================================
 # API ДЛЯ ЛЬГОТНЫХ КРЕДИТОВ
 # ===========================================
 
 @app.get("/api/preferential-loans")
-async def get_all_preferential_loans():
-    """Получить все льготные кредиты"""
-    return await get_loans("preferential_loans")
+async def get_all_preferential_loans(request: Request, response: Response, filters: Annotated[ProductFilters, Query()]):
+    """Получить все льготные кредиты (max_rate, min_amount, term_months, sort - фильтры в БД)"""
+    if filters.is_set():
+        return await catalog_filtered("preferential_loans", filters, request, response)
+    return await catalog_list("preferential_loans", lambda: get_loans("preferential_loans"), request, response)
 
 @app.get("/api/preferential-loans/{loan_id}")
-async def get_preferential_loan(loan_id: int):
+async def get_preferential_loan(loan_id: int, request: Request, response: Response):
     """Получить льготный кредит по ID"""
-    loan = await get_loan_by_id("preferential_loans", loan_id)
-    if not loan:
-        raise HTTPException(status_code=404, detail="Кредит не найден")
-    return loan
+    return await catalog_item(
+        "preferential_loans", loan_id, lambda: get_loan_by_id("preferential_loans", loan_id),
+        request, response, "Кредит не найден"
+    )
 
 @app.post("/api/preferential-loans")
 async def create_preferential_loan(loan: LoanCreate):
     """Добавить новый льготный кредит"""
     try:
         async with async_session_factory() as session:
-            advantages_json = json.dumps(loan.advantage, ensure_ascii=False)
-            
-            await session.execute(text("""
-                INSERT INTO preferential_loans (name, rate, term, amount, advantage, details)
-                VALUES (:name, :rate, :term, :amount, :advantage, :details)
-            """), {
-                "name": loan.name,
-                "rate": loan.rate,
-                "term": loan.term,
-                "amount": loan.amount,
-                "advantage": advantages_json,
-                "details": loan.details
-            })
+            await session.execute(insert_returning_id("preferential_loans"), product_values(loan))
             await session.commit()
+            catalog_cache.invalidate("preferential_loans")
             return {"status": "success", "message": "✅ Льготный кредит успешно добавлен"}
     except Exception as e:
         print(f"Error in create_preferential_loan: {e}")
@@ -579,10 +793,9 @@ async def delete_preferential_loan(loan_id: int):
     """Удалить льготный кредит"""
     try:
         async with async_session_factory() as session:
-            result = await session.execute(text("""
-                DELETE FROM preferential_loans WHERE id = :id
-            """), {"id": loan_id})
+            result = await session.execute(delete_by_id("preferential_loans"), {"id": loan_id})
             await session.commit()
+            catalog_cache.invalidate("preferential_loans")
             
             if result.rowcount == 0:
                 return {"status": "error", "message": "❌ Кредит не найден"}
@@ -590,55 +803,107 @@ async def delete_preferential_loan(loan_id: int):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.post("/api/preferential-loans/bulk")
+async def bulk_create_preferential_loans(items: list = Body(...)):
+    """Пакетно добавить льготные кредиты"""
+    return await bulk_create("preferential_loans", LoanCreate, items)
+
+@app.post("/api/preferential-loans/bulk-delete")
+async def bulk_delete_preferential_loans(payload: BulkDelete):
+    """Пакетно удалить льготные кредиты по списку ID"""
+    return await bulk_delete("preferential_loans", payload.ids)
+
 # ===========================================
-# API ДЛЯ ВКЛАДОВ
+# КРЕДИТНЫЙ КАЛЬКУЛЯТОР
 # ===========================================
 
-@app.get("/api/deposits")
-async def get_all_deposits():
-    """Получить все вклады с JSONB преимуществами"""
+@app.post("/api/loans/calculate")
+async def calculate_loans(calc: LoanCalculation):
+    """Платежи и переплата по всем сочетаниям сумм и сроков (аннуитет и дифференцированный)
+
+    Ставку, сумму и срок можно взять из продукта: без amounts/terms
+    считается максимальная сумма на максимальный срок продукта.
+    """
+    rate, amounts, terms = calc.rate, calc.amounts, calc.terms
+    product = None
+    if calc.product_id is not None:
+        if calc.product_table not in LOAN_TABLES:
+            raise HTTPException(status_code=400, detail=f"product_table должен быть одним из: {', '.join(LOAN_TABLES)}")
+        product = await get_loan_by_id(calc.product_table, calc.product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Кредит не найден")
+        numbers = product_numbers(product)
+        rate = rate if rate is not None else numbers["rate_pct"]
+        amounts = amounts or [numbers["amount_max_byn"]]
+        terms = terms or [numbers["term_months"]]
+    
+    if rate is None:
+        raise HTTPException(status_code=400, detail="Укажите rate или product_table и product_id")
+    amounts = [amount for amount in amounts if amount]
+    terms = [term for term in terms if term]
+    if not amounts or not terms:
+        raise HTTPException(status_code=400, detail="Укажите amounts и terms")
+    
     try:
-        async with async_session_factory() as session:
-            result = await session.execute(
-                text("SELECT * FROM deposits ORDER BY id")
-            )
-            rows = result.mappings().all()
-            
-            deposits = []
-            for row in rows:
-                deposit_dict = dict(row)
-                # Парсим JSONB поле advantage
-                if deposit_dict.get('advantage'):
-                    try:
-                        if isinstance(deposit_dict['advantage'], str):
-                            deposit_dict['advantage'] = json.loads(deposit_dict['advantage'])
-                        elif isinstance(deposit_dict['advantage'], list):
-                            pass
-                        else:
-                            deposit_dict['advantage'] = [str(deposit_dict['advantage'])]
-                    except:
+        scenarios = loan_calculator.calculate(rate, amounts, terms, calc.schedule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Графики - десятки тысяч чисел: отдаём сразу orjson, минуя jsonable_encoder
+    return ORJSONResponse({
+        "rate": rate,
+        "product": {"table": calc.product_table, "id": product["id"], "name": product["name"]} if product else None,
+        "scenarios": scenarios,
+    })
+
+# ===========================================
+# API ДЛЯ ВКЛАДОВ
+# ===========================================
+
+async def fetch_deposits():
+    """Прочитать все вклады из таблицы (без кэша)"""
+    if settings.DB_JSON_AGG:
+        return await fetch_json_rows("deposits")
+    async with async_session_factory() as session:
+        result = await session.execute(select_all("deposits"))
+        rows = result.mappings().all()
+        
+        deposits = []
+        for row in rows:
+            deposit_dict = dict(row)
+            # Парсим JSONB поле advantage
+            if deposit_dict.get('advantage'):
+                try:
+                    if isinstance(deposit_dict['advantage'], str):
+                        deposit_dict['advantage'] = json.loads(deposit_dict['advantage'])
+                    elif isinstance(deposit_dict['advantage'], list):
+                        pass
+                    else:
                         deposit_dict['advantage'] = [str(deposit_dict['advantage'])]
-                else:
-                    deposit_dict['advantage'] = []
-                deposits.append(deposit_dict)
-            
-            return deposits
+                except:
+                    deposit_dict['advantage'] = [str(deposit_dict['advantage'])]
+            else:
+                deposit_dict['advantage'] = []
+            deposits.append(deposit_dict)
+        
+        return deposits
+
+async def load_deposits():
+    """Все вклады через кэш каталога"""
+    try:
+        return await catalog_cache.get("deposits", fetch_deposits)
     except Exception as e:
         print(f"Error in get_all_deposits: {e}")
         return []
 
-@app.get("/api/deposits/{deposit_id}")
-async def get_deposit(deposit_id: int):
-    """Получить вклад по ID"""
+async def get_deposit_by_id(deposit_id: int):
+    """Получить вклад по ID из БД"""
     try:
         async with async_session_factory() as session:
-            result = await session.execute(
-                text("SELECT * FROM deposits WHERE id = :id"),
-                {"id": deposit_id}
-            )
+            result = await session.execute(select_by_id("deposits"), {"id": deposit_id})
             row = result.mappings().first()
             if not row:
-                raise HTTPException(status_code=404, detail="Вклад не найден")
+                return None
             
             deposit_dict = dict(row)
             # Парсим JSONB поле advantage
@@ -655,27 +920,91 @@ async def get_deposit(deposit_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/deposits")
+async def get_all_deposits(request: Request, response: Response, filters: Annotated[ProductFilters, Query()]):
+    """Получить все вклады с JSONB преимуществами (max_rate, min_amount, term_months, sort - фильтры в БД)"""
+    if filters.is_set():
+        return await catalog_filtered("deposits", filters, request, response)
+    return await catalog_list("deposits", load_deposits, request, response)
+
+@app.get("/api/deposits/project")
+async def project_all_deposits(
+    amount: float = Query(..., gt=0),
+    months: int = Query(..., ge=1, le=MAX_TERM_MONTHS),
+):
+    """Сравнить все вклады: итоговая сумма и эффективная доходность за horizon months
+
+    Капитализация учитывается по полю capitalization. Вклад короче горизонта
+    считается на свой срок (term_shorter_than_horizon). Вклады, для которых
+    сумма вне min_amount/max_amount или срок длиннее горизонта (досрочное
+    снятие - не по ставке вклада), возвращаются отдельно в ineligible -
+    то же правило, что у /api/match.
+    """
+    deposits = await load_deposits()
+    if not deposits:
+        return {"amount": amount, "months": months, "ranking": [], "ineligible": []}
+    
+    numbers = [product_numbers(deposit) for deposit in deposits]
+    rates = np.array([n["rate_pct"] if n["rate_pct"] is not None else np.nan for n in numbers], dtype=np.float64)
+    terms = np.array([n["term_months"] or months for n in numbers], dtype=np.float64)
+    min_amounts = np.array([n["min_amount_byn"] if n["min_amount_byn"] is not None else 0 for n in numbers], dtype=np.float64)
+    max_amounts = np.array([n["max_amount_byn"] if n["max_amount_byn"] is not None else np.inf for n in numbers], dtype=np.float64)
+    periods = np.array([capitalization_periods(deposit.get("capitalization")) for deposit in deposits])
+    
+    placement = np.minimum(terms, months)
+    balance, effective_yield = project_deposits(amount, np.nan_to_num(rates), periods, placement)
+    eligible = (amount >= min_amounts) & (amount <= max_amounts) & ~np.isnan(rates) & (terms <= months)
+    
+    ranking, ineligible = [], []
+    # Лучший - с большей эффективной доходностью, при равенстве - с большим итогом
+    for i in np.lexsort((-balance, -effective_yield)):
+        deposit = deposits[i]
+        item = {
+            "id": deposit["id"],
+            "name": deposit["name"],
+            "rate_pct": None if np.isnan(rates[i]) else float(rates[i]),
+            "capitalization": deposit.get("capitalization"),
+            "capitalizations_per_year": int(periods[i]),
+            "months": int(placement[i]),
+            "term_shorter_than_horizon": bool(terms[i] < months),
+        }
+        if eligible[i]:
+            ranking.append({
+                **item,
+                "rank": len(ranking) + 1,
+                "final_balance": round(float(balance[i]), 2),
+                "income": round(float(balance[i] - amount), 2),
+                "effective_yield_pct": round(float(effective_yield[i]), 3),
+            })
+        else:
+            if np.isnan(rates[i]):
+                reason = "Ставка не распознана"
+            elif terms[i] > months:
+                reason = "Срок вклада длиннее горизонта"
+            elif amount < min_amounts[i]:
+                reason = "Сумма меньше минимальной"
+            else:
+                reason = "Сумма больше максимальной"
+            ineligible.append({**item, "reason": reason})
+    
+    return {"amount": amount, "months": months, "ranking": ranking, "ineligible": ineligible}
+
+@app.get("/api/deposits/{deposit_id}")
+async def get_deposit(deposit_id: int, request: Request, response: Response):
+    """Получить вклад по ID"""
+    return await catalog_item(
+        "deposits", deposit_id, lambda: get_deposit_by_id(deposit_id),
+        request, response, "Вклад не найден"
+    )
+
 @app.post("/api/deposits")
 async def create_deposit(deposit: DepositCreate):
     """Добавить новый вклад с JSONB преимуществами"""
     try:
         async with async_session_factory() as session:
-            advantages_json = json.dumps(deposit.advantage, ensure_ascii=False)
-            
-            await session.execute(text("""
-                INSERT INTO deposits (name, rate, term, min_amount, max_amount, capitalization, advantage, details)
-                VALUES (:name, :rate, :term, :min_amount, :max_amount, :capitalization, :advantage, :details)
-            """), {
-                "name": deposit.name,
-                "rate": deposit.rate,
-                "term": deposit.term,
-                "min_amount": deposit.min_amount,
-                "max_amount": deposit.max_amount,
-                "capitalization": deposit.capitalization,
-                "advantage": advantages_json,
-                "details": deposit.details
-            })
+            await session.execute(insert_returning_id("deposits"), product_values(deposit))
             await session.commit()
+            catalog_cache.invalidate("deposits")
             return {"status": "success", "message": "✅ Вклад успешно добавлен"}
     except Exception as e:
         print(f"Error in create_deposit: {e}")
@@ -687,10 +1016,9 @@ async def delete_deposit(deposit_id: int):
     """Удалить вклад"""
     try:
         async with async_session_factory() as session:
-            result = await session.execute(text("""
-                DELETE FROM deposits WHERE id = :id
-            """), {"id": deposit_id})
+            result = await session.execute(delete_by_id("deposits"), {"id": deposit_id})
             await session.commit()
+            catalog_cache.invalidate("deposits")
             
             if result.rowcount == 0:
                 return {"status": "error", "message": "❌ Вклад не найден"}
@@ -699,48 +1027,542 @@ async def delete_deposit(deposit_id: int):
         print(f"Error in delete_deposit: {e}")
         return {"status": "error", "message": str(e)}
 
+@app.post("/api/deposits/bulk")
+async def bulk_create_deposits(items: list = Body(...)):
+    """Пакетно добавить вклады"""
+    return await bulk_create("deposits", DepositCreate, items)
+
+@app.post("/api/deposits/bulk-delete")
+async def bulk_delete_deposits(payload: BulkDelete):
+    """Пакетно удалить вклады по списку ID"""
+    return await bulk_delete("deposits", payload.ids)
+
+# ===========================================
+# ЕДИНЫЙ КАТАЛОГ (ВСЕ ПРОДУКТЫ ОДНИМ ЗАПРОСОМ)
+# ===========================================
+
+CATALOG_SECTIONS = ("consumer_loans", "mortgage_loans", "preferential_loans", "deposits")
+
+def catalog_summary(table_name: str, items: list) -> dict:
+    """Сводка по разделу каталога: количество, минимальная ставка, максимальная сумма"""
+    amount_field = "max_amount" if table_name == "deposits" else "amount"
+    numeric_amount = "max_amount_byn" if table_name == "deposits" else "amount_max_byn"
+    # Числовые колонки заполнены при записи; разбор строки - для ещё не пересчитанных строк
+    rates = [rate for rate in (
+        item.get("rate_pct") if item.get("rate_pct") is not None else parse_rate(item.get("rate")) for item in items
+    ) if rate is not None]
+    amounts = [amount for amount in (
+        item.get(numeric_amount) if item.get(numeric_amount) is not None else parse_amount(item.get(amount_field))
+        for item in items
+    ) if amount is not None]
+    return {
+        "count": len(items),
+        "min_rate": min(rates) if rates else None,
+        "max_amount": max(amounts) if amounts else None,
+    }
+
+@app.get("/api/catalog/facets")
+async def get_catalog_facets(request: Request, response: Response):
+    """Все преимущества (advantage) по разделам каталога с числом продуктов
+
+    Значение подставляется в фильтр списка: /api/deposits?advantage=...
+    """
+    fresh = all(catalog_cache.is_fresh(table_name) for table_name in CATALOG_SECTIONS)
+    etag = table_versions.etag_many("facets", CATALOG_SECTIONS)
+    if fresh:
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+    
+    try:
+        async with async_session_factory() as session:
+            result = await session.execute(select_advantage_facets())
+            rows = result.mappings().all()
+    except Exception as e:
+        print(f"Error in get_catalog_facets: {e}")
+        return {"status": "error", "message": str(e)}
+    
+    facets = {table_name: [] for table_name in CATALOG_SECTIONS}
+    totals = {}
+    for row in rows:
+        facets[row["section"]].append({"value": row["value"], "count": row["count"]})
+        totals[row["value"]] = totals.get(row["value"], 0) + row["count"]
+    
+    if fresh and table_versions.etag_many("facets", CATALOG_SECTIONS) == etag:
+        set_etag(response, etag)
+    return {
+        "sections": facets,
+        "all": [{"value": value, "count": count} for value, count in sorted(totals.items(), key=lambda item: (-item[1], item[0]))],
+    }
+
+@app.get("/api/catalog")
+async def get_catalog(
+    request: Request,
+    response: Response,
+    summary: str = Query("false", pattern="^(true|false|1|0|only)$"),
+):
+    """Все кредиты и вклады одним ответом
+
+    Разделы читаются параллельно (asyncio.gather), каждый в своей сессии,
+    через кэш каталога. summary=true - со сводкой по разделам,
+    summary=only - только сводка (без списков продуктов).
+    """
+    summary_only = summary == "only"
+    with_summary = summary_only or summary in ("true", "1")
+    etag_parts = ("summary-only" if summary_only else "summary",) if with_summary else ()
+    etag = table_versions.etag_many("catalog", CATALOG_SECTIONS, *etag_parts)
+    if all(catalog_cache.is_fresh(table_name) for table_name in CATALOG_SECTIONS):
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+    
+    sections = await asyncio.gather(
+        get_loans("consumer_loans"),
+        get_loans("mortgage_loans"),
+        get_loans("preferential_loans"),
+        load_deposits(),
+    )
+    
+    def build():
+        catalog = {} if summary_only else dict(zip(CATALOG_SECTIONS, sections))
+        if with_summary:
+            catalog["summary"] = {
+                table_name: catalog_summary(table_name, items) for table_name, items in zip(CATALOG_SECTIONS, sections)
+            }
+        return catalog
+    
+    # Версии сменились во время загрузки - разделы могут быть старше нового ETag
+    if (
+        all(catalog_cache.is_fresh(table_name) for table_name in CATALOG_SECTIONS)
+        and table_versions.etag_many("catalog", CATALOG_SECTIONS, *etag_parts) == etag
+    ):
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        # Сводка и сериализация считаются один раз на версию каталога
+        return encoded_response(request, etag, build)
+    return build()
+
+# ===========================================
+# ПОДБОР ПРОДУКТОВ
+# ===========================================
+
+# Загрузчики таблиц каталога (через кэш): индекс подбора и страницы продуктов (SSR)
+CATALOG_LOADERS = {
+    "consumer_loans": lambda: get_loans("consumer_loans"),
+    "mortgage_loans": lambda: get_loans("mortgage_loans"),
+    "preferential_loans": lambda: get_loans("preferential_loans"),
+    "deposits": load_deposits,
+}
+page_registry.catalog_loaders = CATALOG_LOADERS
+
+@app.get("/api/match")
+async def match_products(
+    amount: float = Query(..., gt=0),
+    months: int = Query(..., ge=1, le=MAX_TERM_MONTHS),
+    purpose: str = "loan",
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Подобрать продукты под сумму и срок: кредиты по платежу, вклады по доходности
+
+    purpose: loan (все кредиты), consumer, mortgage, preferential, deposit, any.
+    Ответ строится по индексу в памяти; индекс перестраивается из кэша
+    каталога, только когда таблицы менялись.
+    """
+    if purpose not in PURPOSES:
+        raise HTTPException(status_code=400, detail=f"purpose должен быть одним из: {', '.join(PURPOSES)}")
+    
+    await match_index.ensure(CATALOG_LOADERS)
+    return {"amount": amount, "months": months, "purpose": purpose, **match_index.match(amount, months, purpose, limit)}
+
+# ===========================================
+# ПОИСК ПО КАТАЛОГУ
+# ===========================================
+
+@app.get("/api/search")
+async def search_catalog(
+    q: str = Query(..., min_length=1, max_length=200),
+    prefix: bool = False,
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Полнотекстовый поиск по названию, преимуществам и описанию всех продуктов
+
+    prefix=true - поиск по началу слов (для подсказок по мере набора).
+    В name_highlight/details_highlight совпадения обёрнуты в <mark>, остальной
+    текст экранирован - фрагмент можно вставлять как HTML.
+    """
+    query_text = prefix_tsquery(q) if prefix else q
+    if not query_text.strip():
+        return {"query": q, "items": []}
+    
+    try:
+        async with async_session_factory() as session:
+            result = await session.execute(search_products(prefix), {"q": query_text, "limit": limit})
+            rows = result.mappings().all()
+    except Exception as e:
+        print(f"Error in search_catalog: {e}")
+        traceback.print_exc()
+        return {"status": "error", "message": str(e)}
+    
+    items = []
+    for row in rows:
+        item = dict(row)
+        item["advantage"] = safe_json_loads(item.get("advantage"))
+        item["rank"] = round(float(item["rank"]), 4)
+        items.append(item)
+    return {"query": q, "items": items}
+
 # ===========================================
 # API ДЛЯ ЗАЯВОК
 # ===========================================
 
+def duplicate_contact(telegram_id: int, existing: dict) -> dict:
+    """Ответ на повторную заявку в окне дедупликации"""
+    return {
+        "status": "success",
+        "message": "✅ Заявка уже принята! Менеджер свяжется с вами.",
+        "telegram_id": telegram_id,
+        "duplicate": True,
+        **existing
+    }
+
 @app.post("/api/contact-request")
 async def save_contact_request(request: ContactRequest):
-    """Сохранить заявку с Telegram ID"""
+    """Сохранить заявку с Telegram ID
+
+    Повтор с того же telegram_id в течение CONTACT_DEDUP_SECONDS новой
+    заявки не создаёт - возвращается id уже созданной. telegram_id 0
+    (форма открыта не из Telegram) не дедуплицируется.
+    """
+    telegram_id = request.telegram_id
+    dedup = settings.CONTACT_DEDUP_SECONDS > 0 and telegram_id > 0
     try:
+        if dedup:
+            existing = recent_contacts.get(telegram_id)
+            if existing is not None:
+                return duplicate_contact(telegram_id, existing)
+        
+        if settings.CONTACT_QUEUE_ENABLED:
+            # Ответ после записи в журнал, в БД заявка уйдёт пакетом
+            ingest_uid = contact_queue.enqueue(request.model_dump())
+            if dedup:
+                recent_contacts.put(telegram_id, {"ingest_uid": ingest_uid})
+            await contact_queue.synced()
+            return {
+                "status": "success",
+                "message": "✅ Заявка принята! Менеджер свяжется с вами.",
+                "telegram_id": telegram_id,
+                "ingest_uid": ingest_uid
+            }
+        
         async with async_session_factory() as session:
-            await session.execute(text("""
-                INSERT INTO contact_requests (telegram_id, username, first_name, last_name, status)
-                VALUES (:telegram_id, :username, :first_name, :last_name, 'new')
-            """), {
-                "telegram_id": request.telegram_id,
-                "username": request.username,
-                "first_name": request.first_name,
-                "last_name": request.last_name
-            })
+            if dedup:
+                # Та же заявка могла прийти через другой воркер
+                await session.execute(lock_contact_key, {"telegram_id": telegram_id})
+                result = await session.execute(
+                    select_recent_contact, {"telegram_id": telegram_id, "window": settings.CONTACT_DEDUP_SECONDS}
+                )
+                existing_id = result.scalar()
+                if existing_id is not None:
+                    await session.commit()
+                    # В кэш не кладём: окно считается от заявки в БД, а не от повтора
+                    # (у RecentKeys TTL у всех записей один - полный CONTACT_DEDUP_SECONDS)
+                    return duplicate_contact(telegram_id, {"request_id": existing_id})
+            
+            result = await session.execute(insert_contact, {**request.model_dump(), "status": "new"})
+            request_id = result.scalar_one()
             await session.commit()
+            table_versions.bump("contact_requests")
+            if dedup:
+                recent_contacts.put(telegram_id, {"request_id": request_id})
             
             return {
                 "status": "success", 
                 "message": "✅ Заявка сохранена! Менеджер свяжется с вами.",
-                "telegram_id": request.telegram_id
+                "telegram_id": telegram_id,
+                "request_id": request_id
             }
     except Exception as e:
         print(f"Error in save_contact_request: {e}")
         return {"status": "error", "message": str(e)}
 
 @app.get("/api/contact-requests")
-async def get_contact_requests():
-    """Получить все заявки"""
+async def get_contact_requests(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
+    status: str | None = None,
+    telegram_id: int | None = None,
+):
+    """Получить заявки постранично (новые сверху)
+
+    Следующая страница запрашивается с cursor=next_cursor из ответа.
+    """
+    # ETag считаем до запроса: запись во время чтения даст новую версию
+    table_versions.current("contact_requests", settings.CONTACT_REQUESTS_ETAG_TTL)
+    etag = table_versions.etag("contact_requests", query_fingerprint(request))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    params = contact_filters(status=status, telegram_id=telegram_id)
+    query = contacts_query(params, keyset=cursor is not None)
+    params["limit"] = limit + 1
+    if cursor:
+        params["cursor_created_at"], params["cursor_id"] = decode_cursor(cursor)
+    
+    if settings.DB_JSON_AGG:
+        return await contact_requests_json(params, cursor is not None, limit, etag)
+    
     try:
         async with async_session_factory() as session:
-            result = await session.execute(
-                text("SELECT * FROM contact_requests ORDER BY created_at DESC")
-            )
+            result = await session.execute(query, params)
             rows = result.mappings().all()
-            return [dict(row) for row in rows]
     except Exception as e:
         print(f"Error in get_contact_requests: {e}")
         return {"status": "error", "message": str(e)}
+    
+    items = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    
+    set_etag(response, etag)
+    return {"items": items, "next_cursor": next_cursor, "limit": limit}
+
+async def contact_requests_json(params: dict, keyset: bool, limit: int, etag: str):
+    """Страница заявок, собранная в PostgreSQL: строки в Python не разбираются"""
+    query = select_contacts_json(
+        "status" in params, "telegram_id" in params, "date_from" in params, "date_to" in params, keyset=keyset
+    )
+    try:
+        async with async_session_factory() as session:
+            page = (await session.execute(query, {**params, "page_size": limit})).one()
+    except Exception as e:
+        print(f"Error in get_contact_requests: {e}")
+        return {"status": "error", "message": str(e)}
+    
+    next_cursor = None
+    if page.fetched > limit:
+        next_cursor = encode_cursor(page.last_created_at, page.last_id)
+    body = b"".join((
+        b'{"items":', page.items.encode(),
+        b',"next_cursor":', orjson.dumps(next_cursor),
+        b',"limit":', str(limit).encode(), b"}",
+    ))
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/api/contact-requests/stats")
+async def get_contact_requests_stats(request: Request, response: Response):
+    """Сводка по заявкам одним GROUP BY: счётчики по статусам, за сегодня/неделю, возраст старой необработанной"""
+    table_versions.current("contact_requests", settings.CONTACT_REQUESTS_ETAG_TTL)
+    etag = table_versions.etag("contact_requests", "stats")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    try:
+        async with async_session_factory() as session:
+            result = await session.execute(contact_stats)
+            rows = result.mappings().all()
+    except Exception as e:
+        print(f"Error in get_contact_requests_stats: {e}")
+        return {"status": "error", "message": str(e)}
+    
+    by_status = {row["status"]: row["total"] for row in rows}
+    unprocessed = next((row for row in rows if row["status"] == "new"), None)
+    
+    set_etag(response, etag)
+    return {
+        "total": sum(by_status.values()),
+        "unprocessed": by_status.get("new", 0),
+        "by_status": by_status,
+        "today": sum(row["today"] for row in rows),
+        "week": sum(row["week"] for row in rows),
+        "oldest_unprocessed_at": unprocessed["oldest"] if unprocessed else None,
+        "oldest_unprocessed_age_seconds": int(unprocessed["oldest_age"]) if unprocessed and unprocessed["oldest_age"] is not None else None,
+    }
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+}
+EXPORT_COLUMNS = ("id", "telegram_id", "username", "first_name", "last_name", "created_at", "status")
+
+# Сколько строк забирать с серверного курсора за раз
+EXPORT_BATCH_SIZE = 1000
+
+@app.get("/api/contact-requests/export")
+async def export_contact_requests(
+    export_format: str = Query("ndjson", alias="format"),
+    status: str | None = None,
+    telegram_id: int | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+):
+    """Выгрузить заявки потоком (NDJSON или CSV) через серверный курсор
+
+    Строки читаются пачками по EXPORT_BATCH_SIZE и сразу отправляются
+    клиенту, поэтому память не растёт с размером выгрузки. Запрос
+    выполняется до начала ответа: ошибка БД - ответ с ошибкой, а не
+    обрезанный файл со статусом 200.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Формат должен быть одним из: {', '.join(EXPORT_FORMATS)}")
+    
+    params = contact_filters(status, telegram_id, date_from, date_to)
+    if "date_from" in params and "date_to" in params and params["date_from"] > params["date_to"]:
+        raise HTTPException(status_code=400, detail="date_from позже date_to")
+    query = contacts_query(params, newest_first=False)
+    
+    conn = await async_engine.connect()
+    try:
+        result = await conn.stream(query, params)
+    except Exception as e:
+        await conn.close()
+        print(f"Error in export_contact_requests: {e}")
+        return {"status": "error", "message": str(e)}
+    
+    async def generate():
+        try:
+            if export_format == "csv":
+                # BOM, чтобы Excel открыл кириллицу без настройки кодировки
+                yield ("\ufeff" + ",".join(EXPORT_COLUMNS) + "\r\n").encode("utf-8")
+            async for rows in result.mappings().partitions(EXPORT_BATCH_SIZE):
+                if export_format == "csv":
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                    for row in rows:
+                        writer.writerow([
+                            row[col].isoformat() if isinstance(row[col], datetime) else row[col]
+                            for col in EXPORT_COLUMNS
+                        ])
+                    yield buffer.getvalue().encode("utf-8")
+                else:
+                    yield "".join(
+                        json.dumps({col: row[col] for col in EXPORT_COLUMNS}, ensure_ascii=False, default=json_default) + "\n"
+                        for row in rows
+                    ).encode("utf-8")
+        finally:
+            await conn.close()
+    
+    filename = f"contact_requests_{datetime.now():%Y%m%d_%H%M%S}.{export_format}"
+    return StreamingResponse(
+        generate(),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# ===========================================
+# ИМПОРТ ИЗ ФАЙЛОВ (CSV / NDJSON)
+# ===========================================
+
+@app.post("/api/admin/import/{table_name}")
+async def import_table(table_name: str, request: Request, format: str | None = None):
+    """Потоково загрузить CSV/NDJSON из тела запроса в таблицу через COPY
+
+    Пример: curl -X POST --data-binary @loans.csv -H "Content-Type: text/csv" .../api/admin/import/consumer_loans
+    """
+    if table_name not in IMPORT_TABLES:
+        raise HTTPException(status_code=404, detail="Импорт в эту таблицу не поддерживается")
+    
+    content_type = request.headers.get("content-type", "")
+    file_format = format or ("ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv")
+    if file_format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Формат должен быть одним из: {', '.join(IMPORT_FORMATS)}")
+    
+    try:
+        report = await import_stream(table_name, request.stream(), file_format)
+    except Exception as e:
+        print(f"Error in import_table for {table_name}: {e}")
+        traceback.print_exc()
+        return {"status": "error", "message": str(e)}
+    
+    if report["imported"]:
+        if table_name == "contact_requests":
+            table_versions.bump(table_name)
+        else:
+            catalog_cache.invalidate(table_name)
+    return {
+        "status": "success" if not report["rejected"] else "partial",
+        "message": f"✅ Загружено: {report['imported']}, отклонено: {report['rejected']}",
+        "table": table_name,
+        **report
+    }
+
+# ===========================================
+# ПРОГРЕВ ПРИ СТАРТЕ И ГОТОВНОСТЬ
+# ===========================================
+
+async def prepare_hot_statements(conn):
+    """Выполнить частые запросы на соединении: asyncpg кэширует их подготовленными
+
+    Только запросы с дешёвыми параметрами (несуществующий id, limit 1).
+    Полные списки каталога и статистика заявок на каждом соединении не
+    читаются: каталог читается один раз на версию и дальше отдаётся из кэша.
+    """
+    for table_name in CATALOG_SECTIONS:
+        await conn.execute(select_by_id(table_name), {"id": 0})
+    await conn.execute(contacts_query({}), {"limit": 1})
+    await conn.execute(
+        contacts_query({}, keyset=True), {"limit": 1, "cursor_created_at": datetime.now(), "cursor_id": 0}
+    )
+
+async def warmup(app: FastAPI) -> bool:
+    """Схема (идемпотентно), WARMUP_CONNECTIONS соединений пула с подготовленными
+    запросами, кэш каталога и индекс подбора. True - приложение готово."""
+    started = asyncio.get_running_loop().time()
+    try:
+        for table_name in TABLES:
+            await create_table(table_name)
+        
+        # Соединения держим одновременно, иначе пул выдаст одно и то же
+        async with AsyncExitStack() as stack:
+            connections = [
+                await stack.enter_async_context(async_engine.connect())
+                for _ in range(settings.WARMUP_CONNECTIONS)
+            ]
+            await asyncio.gather(*(prepare_hot_statements(conn) for conn in connections))
+        
+        catalog_cache.clear()
+        await asyncio.gather(*(get_loans(table_name) for table_name in LOAN_TABLES), load_deposits())
+        # Загрузчики при ошибке БД отдают [] - готовность только с заполненным кэшем
+        # (при CATALOG_CACHE_TTL=0 кэша нет и проверять нечего)
+        failed = [
+            table_name for table_name in CATALOG_SECTIONS
+            if settings.CATALOG_CACHE_TTL > 0 and not catalog_cache.is_fresh(table_name)
+        ]
+        if failed:
+            raise RuntimeError(f"Каталог не загружен: {', '.join(failed)}")
+        await match_index.ensure(CATALOG_LOADERS)
+    except Exception as e:
+        print(f"⚠️ Прогрев не завершён: {e}")
+        traceback.print_exc()
+        return False
+    
+    app.state.ready = True
+    print(f"✅ Прогрев завершён за {asyncio.get_running_loop().time() - started:.2f} с")
+    return True
+
+async def warmup_until_ready(app: FastAPI):
+    """Повторять прогрев, пока БД не станет доступна"""
+    while not app.state.ready:
+        await asyncio.sleep(settings.WARMUP_RETRY_SECONDS)
+        await warmup(app)
+
+@app.post("/api/admin/pages/reload")
+async def reload_pages():
+    """Перечитать HTML-страницы с диска (после правки или пересборки статики)"""
+    return {"status": "success", "pages": page_registry.reload()}
+
+@app.get("/api/ready")
+async def api_ready():
+    """Готовность к трафику (для балансировщика): 503, пока не завершён прогрев"""
+    if not app.state.ready:
+        return ORJSONResponse({"ready": False}, status_code=503)
+    return {"ready": True}
 
 # ===========================================
 # СТАТУС API
@@ -759,9 +1581,32 @@ async def api_status():
     return {
         "message": "AurumBank API is working!",
         "database": db_status,
+        "catalog_cache": catalog_cache.stats(),
+        "encoded_bodies": encoded_bodies.stats(),
+        "loan_calculator": loan_calculator.stats(),
+        "match_index": match_index.stats(),
+        "contact_queue": contact_queue.stats(),
+        "recent_contacts": recent_contacts.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "pages": page_registry.stats(),
         "version": "6.0.0"
     }
 
+@app.get("/api/pool-status")
+async def api_pool_status():
+    """Пул соединений этого процесса: занятость, переполнение, ожидание соединения
+
+    Пул у каждого воркера uvicorn свой: всего к БД до
+    воркеры x (DB_POOL_SIZE + DB_MAX_OVERFLOW) соединений.
+    """
+    return {
+        "pid": os.getpid(),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "async": pool_status(async_engine.sync_engine),
+        "sync": pool_status(sync_engine),
+    }
+
 if __name__ == "__main__":
     print("=" * 60)
     print("🚀 ЗАПУСК AURUMBANK API")
@@ -769,4 +1614,7 @@ if __name__ == "__main__":
     print(f"📡 Сервер запускается на http://localhost:8000")
     print(f"📊 Документация: http://localhost:8000/docs")
     print("=" * 60)
-    uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run(
+        "api:app", host="0.0.0.0", port=8000, reload=True,
+        proxy_headers=True, forwarded_allow_ips=settings.FORWARDED_ALLOW_IPS,
+    )
\ No newline at end of file
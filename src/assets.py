@@ -0,0 +1,151 @@
+"""Сборка статики: имена с хэшем содержимого, gzip/brotli-варианты, манифест
+
+Сборка (в Dockerfile, после копирования исходников):
+    python src/assets.py
+
+Файлы из style/, javascript/ и img/ копируются в dist/assets/ под именем
+с хэшем содержимого (loans.css -> loans.3f9c1a2b7d.css), для текстовых
+файлов рядом кладутся .gz и .br. Ссылки на другие файлы статики внутри
+CSS/JS и HTML-страниц переписываются на новые имена; страницы пишутся в
+dist/pages/. Соответствие имён - в dist/manifest.json.
+
+Имя меняется вместе с содержимым, поэтому /assets/ отдаётся с
+Cache-Control: immutable - повторный визит статику не запрашивает.
+Без сборки страницы и статика отдаются из исходников как раньше.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import sys
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+
+sys.path.append(os.path.dirname(__file__))
+from config import settings
+from responses import accepts_encoding
+
+# Каталоги статики; img первым - на картинки ссылаются CSS и JS
+ASSET_DIRS = ("img", "style", "javascript")
+
+# Что имеет смысл сжимать (PNG/JPG уже сжаты)
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt")
+
+# Варианты по убыванию предпочтения: Accept-Encoding -> расширение файла
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+ASSET_URL = "/assets/"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Ссылка на статику в кавычках или url(...): "style/a.css", '../img/logo.png'
+ASSET_REF = re.compile(r"""(["'(])(?:\.\./|\./|/)?((?:%s)/[\w.\-/]+)""" % "|".join(ASSET_DIRS))
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def rewrite_refs(text: str, manifest: dict) -> str:
+    """Заменить ссылки на исходные файлы статики ссылками на собранные"""
+    def replace(match):
+        url = manifest.get(match.group(2))
+        return match.group(1) + url if url else match.group(0)
+    return ASSET_REF.sub(replace, text)
+
+
+def write_variants(path: str, data: bytes):
+    """.gz и .br рядом с файлом (максимальное сжатие - сжимаем один раз при сборке)"""
+    import brotli  # нужен только сборке
+
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    with open(path + ".br", "wb") as f:
+        f.write(brotli.compress(data, quality=11))
+
+
+def build(source_dir: str = ".", out_dir: str | None = None) -> dict:
+    """Собрать статику и страницы в out_dir; вернуть манифест"""
+    out_dir = out_dir or settings.ASSETS_DIR
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    manifest = {}
+
+    for asset_dir in ASSET_DIRS:
+        for root, _, files in os.walk(os.path.join(source_dir, asset_dir)):
+            for filename in sorted(files):
+                source = os.path.join(root, filename)
+                name = os.path.relpath(source, source_dir).replace(os.sep, "/")
+                with open(source, "rb") as f:
+                    data = f.read()
+                stem, ext = os.path.splitext(name)
+                if ext in COMPRESSIBLE:
+                    data = rewrite_refs(data.decode("utf-8"), manifest).encode("utf-8")
+
+                hashed = f"{stem}.{content_hash(data)}{ext}"
+                target = os.path.join(out_dir, "assets", hashed)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, "wb") as f:
+                    f.write(data)
+                if ext in COMPRESSIBLE:
+                    write_variants(target, data)
+                manifest[name] = ASSET_URL + hashed
+
+    pages_dir = os.path.join(out_dir, "pages")
+    os.makedirs(pages_dir, exist_ok=True)
+    for filename in sorted(os.listdir(source_dir)):
+        if filename.endswith(".html"):
+            with open(os.path.join(source_dir, filename), encoding="utf-8") as f:
+                html = f.read()
+            with open(os.path.join(pages_dir, filename), "w", encoding="utf-8") as f:
+                f.write(rewrite_refs(html, manifest))
+
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(out_dir: str | None = None) -> dict:
+    """Манифест последней сборки; {} - сборки нет"""
+    path = os.path.join(out_dir or settings.ASSETS_DIR, "manifest.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def page_path(filename: str) -> str:
+    """Страница со ссылками на собранную статику, если сборка есть, иначе исходник"""
+    built = os.path.join(settings.ASSETS_DIR, "pages", filename)
+    return built if os.path.exists(built) else filename
+
+
+def asset_response(asset_path: str, accept_encoding: str | None) -> FileResponse:
+    """Собранный файл: br/gzip по Accept-Encoding, кэш навсегда"""
+    root = os.path.realpath(os.path.join(settings.ASSETS_DIR, "assets"))
+    path = os.path.realpath(os.path.join(root, asset_path))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    headers = {"Cache-Control": IMMUTABLE, "Vary": "Accept-Encoding"}
+    if path.endswith(COMPRESSIBLE):
+        for encoding, suffix in ENCODINGS:
+            if accepts_encoding(accept_encoding, encoding) and os.path.exists(path + suffix):
+                headers["Content-Encoding"] = encoding
+                return FileResponse(path + suffix, media_type=media_type, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сборка статики с хэшами имён и сжатыми вариантами")
+    parser.add_argument("--source", default=".", help="каталог с HTML-страницами и style/, javascript/, img/")
+    parser.add_argument("--out", default=settings.ASSETS_DIR, help="куда собрать (по умолчанию ASSETS_DIR)")
+    args = parser.parse_args()
+
+    manifest = build(args.source, args.out)
+    print(f"✅ Собрано файлов: {len(manifest)} -> {args.out}")
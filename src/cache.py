@@ -0,0 +1,208 @@
+import asyncio
+import secrets
+import time
+from collections import OrderedDict
+
+from config import settings
+
+
+# Идентификатор процесса: ETag разных воркеров/перезапусков не совпадут случайно
+BOOT_ID = secrets.token_hex(4)
+
+
+class TableVersions:
+    """Версии таблиц для ETag: растут при каждой записи через API"""
+
+    def __init__(self):
+        self._versions: dict[str, int] = {}
+        self._confirmed_at: dict[str, float] = {}
+
+    def get(self, key: str) -> int:
+        return self._versions.get(key, 0)
+
+    def bump(self, key: str) -> int:
+        self._versions[key] = self.get(key) + 1
+        self._confirmed_at[key] = time.monotonic()
+        return self._versions[key]
+
+    def current(self, key: str, ttl: float) -> int:
+        """Версия, которой можно доверять не дольше ttl секунд
+
+        Для таблиц без кэша (заявки) запись мог сделать другой воркер,
+        поэтому по истечении ttl начинаем новую версию.
+        """
+        confirmed_at = self._confirmed_at.get(key)
+        if confirmed_at is None or time.monotonic() - confirmed_at >= ttl:
+            return self.bump(key)
+        return self.get(key)
+
+    def etag(self, key: str, *parts) -> str:
+        return self.etag_many(key, (key,), *parts)
+
+    def etag_many(self, name: str, keys, *parts) -> str:
+        """ETag ответа, собранного из нескольких таблиц"""
+        versions = ".".join(str(self.get(key)) for key in keys)
+        tag = f"{name}-{BOOT_ID}-v{versions}"
+        if parts:
+            tag += "-" + "-".join(str(part) for part in parts)
+        return f'"{tag}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Сравнение If-None-Match с ETag (слабое сравнение, RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class CacheEntry:
+    """Закэшированный результат чтения одной таблицы каталога"""
+
+    __slots__ = ("value", "loaded_at")
+
+    def __init__(self, value):
+        self.value = value
+        self.loaded_at = time.monotonic()
+
+    def is_fresh(self, ttl: float) -> bool:
+        return ttl > 0 and time.monotonic() - self.loaded_at < ttl
+
+
+class CatalogCache:
+    """Кэш каталога продуктов в памяти процесса (ключ - имя таблицы)
+
+    Одновременные промахи по одному ключу объединяются в один запрос к БД
+    (single-flight). Запись через API сбрасывает ключ, TTL страхует от
+    изменений, сделанных в обход API (другим воркером или вручную в БД).
+    """
+
+    def __init__(self, ttl: float, versions: TableVersions):
+        self.ttl = ttl
+        self.versions = versions
+        self._entries: dict[str, CacheEntry] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._generations: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, loader):
+        """Вернуть значение из кэша или загрузить его через loader()"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.is_fresh(self.ttl):
+            self.hits += 1
+            return entry.value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            # Загрузка уже идёт - ждём её результат, а не идём в БД повторно
+            self.hits += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generations.get(key, 0)
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # помечаем как прочитанное, если ожидающих нет
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+        # Если таблицу изменили во время загрузки, результат мог устареть
+        if self._generations.get(key, 0) == generation:
+            previous = self._entries.get(key)
+            if previous is None or previous.value != value:
+                # Данные изменились в обход API (истёк TTL) - новая версия для ETag
+                self.versions.bump(key)
+            self._entries[key] = CacheEntry(value)
+        future.set_result(value)
+        return value
+
+    def is_fresh(self, key: str) -> bool:
+        """Есть ли для ключа актуальная запись (можно отвечать 304 без БД)"""
+        entry = self._entries.get(key)
+        return entry is not None and entry.is_fresh(self.ttl)
+
+    def etag(self, key: str, *parts) -> str:
+        return self.versions.etag(key, *parts)
+
+    def invalidate(self, key: str):
+        """Сбросить ключ после записи в таблицу"""
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self.versions.bump(key)
+        self._entries.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def clear(self):
+        for key in list(self._entries) + list(self._inflight):
+            self.invalidate(key)
+
+    def stats(self) -> dict:
+        return {
+            "ttl": self.ttl,
+            "keys": sorted(self._entries),
+            "versions": {key: self.versions.get(key) for key in sorted(self._entries)},
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class RecentKeys:
+    """Ключи, встреченные за последние ttl секунд, и значение для каждого
+
+    TTL у всех записей одинаковый, поэтому порядок вставки совпадает с
+    порядком истечения: устаревшие записи снимаются с начала OrderedDict.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _purge(self, now: float):
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Значение ключа, если окно ещё не истекло, иначе None"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        now = time.monotonic()
+        self._entries.pop(key, None)
+        self._entries[key] = (now + self.ttl, value)
+        self._purge(now)
+
+    def stats(self) -> dict:
+        return {"ttl": self.ttl, "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+table_versions = TableVersions()
+catalog_cache = CatalogCache(ttl=settings.CATALOG_CACHE_TTL, versions=table_versions)
+# telegram_id -> недавняя заявка (окно дедупликации)
+recent_contacts = RecentKeys(ttl=settings.CONTACT_DEDUP_SECONDS)
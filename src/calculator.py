@@ -0,0 +1,221 @@
+"""Кредитный калькулятор и доходность вкладов на NumPy
+
+Все сценарии (сумма x срок) считаются одной матричной операцией: строки -
+сценарии, столбцы - месяцы, месяцы за пределами срока сценария маскируются.
+Сводки запоминаются по (ставка, срок, сумма) в LRU; помесячные графики
+не запоминаются - считаются на каждый запрос.
+Доходность вкладов считается сразу по всем продуктам массивами.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+# Предел сценариев в одном запросе и срока одного сценария (50 лет)
+MAX_SCENARIOS = 1000
+MAX_TERM_MONTHS = 600
+
+# Предел графиков в одном запросе: сценарии x наибольший срок (20 графиков по 50 лет)
+MAX_SCHEDULE_MONTHS = 20 * MAX_TERM_MONTHS
+
+# Сколько посчитанных сводок держать в памяти
+CACHE_SIZE = 20000
+
+
+def scenario_key(rate: float, term: int, amount: float) -> tuple:
+    """Корзина мемоизации: ставка до 0.0001%, сумма до копейки"""
+    return round(rate, 4), int(term), round(amount, 2)
+
+
+def compute(rate: float, terms: np.ndarray, amounts: np.ndarray, schedule: bool = False) -> list[dict]:
+    """Посчитать сценарии (terms[i], amounts[i]) при годовой ставке rate, %"""
+    monthly = rate / 100 / 12
+    n = terms.astype(np.float64)
+
+    # Аннуитет: A * r / (1 - (1 + r)^-n); при нулевой ставке - A / n
+    if monthly > 0:
+        payment = amounts * monthly / (1 - (1 + monthly) ** -n)
+    else:
+        payment = amounts / n
+    annuity_total = payment * n
+
+    # Дифференцированный: тело долга равными частями, проценты на остаток
+    principal_part = amounts / n
+    diff_first = principal_part + amounts * monthly
+    diff_last = principal_part * (1 + monthly)
+    diff_interest = amounts * monthly * (n + 1) / 2
+
+    results = []
+    for i in range(len(terms)):
+        results.append({
+            "rate": rate,
+            "term_months": int(terms[i]),
+            "amount": float(amounts[i]),
+            "annuity": {
+                "monthly_payment": round(float(payment[i]), 2),
+                "total": round(float(annuity_total[i]), 2),
+                "overpayment": round(float(annuity_total[i] - amounts[i]), 2),
+            },
+            "differentiated": {
+                "first_payment": round(float(diff_first[i]), 2),
+                "last_payment": round(float(diff_last[i]), 2),
+                "total": round(float(amounts[i] + diff_interest[i]), 2),
+                "overpayment": round(float(diff_interest[i]), 2),
+            },
+        })
+
+    if schedule:
+        annuity_rows, diff_rows = schedules(monthly, terms, amounts, payment)
+        for result, annuity_schedule, diff_schedule in zip(results, annuity_rows, diff_rows):
+            result["annuity"]["schedule"] = annuity_schedule
+            result["differentiated"]["schedule"] = diff_schedule
+    return results
+
+
+def schedules(monthly: float, terms: np.ndarray, amounts: np.ndarray, payment: np.ndarray):
+    """Помесячные графики всех сценариев матрицей (сценарии x месяцы)"""
+    months = np.arange(1, int(terms.max()) + 1)
+    active = months[None, :] <= terms[:, None]
+    k = months[None, :].astype(np.float64)
+    A = amounts[:, None]
+    n = terms[:, None].astype(np.float64)
+
+    # Аннуитет: остаток после k-го платежа A(1+r)^k - P((1+r)^k - 1)/r
+    if monthly > 0:
+        growth = (1 + monthly) ** k
+        balance = A * growth - payment[:, None] * (growth - 1) / monthly
+        balance_before = A * growth / (1 + monthly) - payment[:, None] * (growth / (1 + monthly) - 1) / monthly
+    else:
+        balance = A - payment[:, None] * k
+        balance_before = balance + payment[:, None]
+    annuity_interest = balance_before * monthly
+    annuity_principal = payment[:, None] - annuity_interest
+
+    # Дифференцированный: остаток до k-го платежа A - (k - 1) * A / n
+    principal = A / n
+    diff_interest = (A - (k - 1) * principal) * monthly
+    diff_payment = principal + diff_interest
+    diff_balance = A - k * principal
+
+    shape = (len(terms), len(months))
+
+    def rows(payment_m, interest_m, principal_m, balance_m):
+        out = []
+        for i in range(len(terms)):
+            mask = active[i]
+            out.append({
+                "payment": np.round(payment_m[i][mask], 2).tolist(),
+                "interest": np.round(interest_m[i][mask], 2).tolist(),
+                "principal": np.round(principal_m[i][mask], 2).tolist(),
+                "balance": np.round(np.clip(balance_m[i][mask], 0, None), 2).tolist(),
+            })
+        return out
+
+    return (
+        rows(np.broadcast_to(payment[:, None], shape), annuity_interest, annuity_principal, balance),
+        rows(diff_payment, diff_interest, np.broadcast_to(principal, shape), diff_balance),
+    )
+
+
+class LoanCalculator:
+    """Калькулятор с LRU-кэшем сводок по сценариям"""
+
+    def __init__(self, cache_size: int = CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def calculate(self, rate: float, amounts: list[float], terms: list[int], schedule: bool = False) -> list[dict]:
+        """Все сочетания amounts x terms; сводки, посчитанные ранее, берутся из кэша
+
+        С графиками (до двух таблиц по 600 строк на сценарий) кэш не
+        используется, а размер запроса ограничен MAX_SCHEDULE_MONTHS.
+        """
+        if len(amounts) * len(terms) > MAX_SCENARIOS:
+            raise ValueError(f"Не больше {MAX_SCENARIOS} сценариев (суммы x сроки) за запрос")
+
+        scenarios = [(term, amount) for amount in amounts for term in terms]
+        if schedule:
+            if len(scenarios) * max(terms) > MAX_SCHEDULE_MONTHS:
+                raise ValueError(
+                    f"С графиками - не больше {MAX_SCHEDULE_MONTHS} месяцев (сценарии x наибольший срок) за запрос"
+                )
+            return compute(
+                rate,
+                np.array([term for term, _ in scenarios], dtype=np.int64),
+                np.array([amount for _, amount in scenarios], dtype=np.float64),
+                schedule=True,
+            )
+
+        keys = [scenario_key(rate, term, amount) for term, amount in scenarios]
+        missing = list({key: None for key in keys if key not in self._cache})
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            computed = compute(
+                rate,
+                np.array([key[1] for key in missing], dtype=np.int64),
+                np.array([key[2] for key in missing], dtype=np.float64),
+            )
+            for key, result in zip(missing, computed):
+                self._cache[key] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        results = []
+        for key in keys:
+            # Только что вытесненные при маленьком кэше - досчитываем по одному
+            result = self._cache.get(key)
+            if result is None:
+                result = compute(rate, np.array([key[1]]), np.array([key[2]], dtype=np.float64))[0]
+            else:
+                self._cache.move_to_end(key)
+            results.append(result)
+        return results
+
+    def stats(self) -> dict:
+        return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+loan_calculator = LoanCalculator()
+
+
+# ===========================================
+# ДОХОДНОСТЬ ВКЛАДОВ
+# ===========================================
+
+# Корень слова в поле capitalization -> капитализаций в год (0 - проценты в конце срока)
+CAPITALIZATION_PERIODS = (
+    ("месяч", 12),
+    ("квартал", 4),
+    ("полугод", 2),
+    ("год", 1),
+    ("конце", 0),
+    ("без", 0),
+)
+
+
+def capitalization_periods(value) -> int:
+    """'Ежемесячно' -> 12, 'В конце срока' -> 0; пусто - значение по умолчанию таблицы (ежемесячно)"""
+    if not value:
+        return 12
+    text = str(value).lower()
+    return next((periods for word, periods in CAPITALIZATION_PERIODS if word in text), 0)
+
+
+def project_deposits(amount: float, rates: np.ndarray, periods: np.ndarray, months: np.ndarray):
+    """Итоговый баланс и эффективная годовая доходность для всех вкладов сразу
+
+    rates - годовые ставки, %; periods - капитализаций в год (0 - простые
+    проценты в конце срока); months - срок размещения каждого вклада.
+    """
+    rate = rates / 100
+    years = months / 12
+    # Для простых процентов подставляем 1, чтобы не делить на ноль; результат заменит np.where
+    safe_periods = np.where(periods > 0, periods, 1)
+    compound = amount * (1 + rate / safe_periods) ** (safe_periods * years)
+    simple = amount * (1 + rate * years)
+    balance = np.where(periods > 0, compound, simple)
+    effective_yield = ((balance / amount) ** (1 / years) - 1) * 100
+    return balance, effective_yield
@@ -14,6 +14,72 @@ class Settings(BaseSettings):
     DB_NAME: str = os.getenv("DB_NAME", "telegram_bot")
     TOKEN: str = os.getenv("TOKEN", "")
 
+    # Кэш каталога (кредиты, вклады): время жизни записи в секундах, 0 - без кэша
+    CATALOG_CACHE_TTL: float = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+    # Сколько секунд ETag списка заявок считается актуальным (заявки пишут все воркеры)
+    CONTACT_REQUESTS_ETAG_TTL: float = float(os.getenv("CONTACT_REQUESTS_ETAG_TTL", "10"))
+    # Собирать JSON списков (каталог, заявки) в PostgreSQL через json_agg, а не построчно в Python
+    DB_JSON_AGG: bool = os.getenv("DB_JSON_AGG", "false").lower() in ("1", "true", "yes")
+    # Ответы каталога меньше этого размера (байт) не сжимаются gzip
+    RESPONSE_GZIP_MIN_SIZE: int = int(os.getenv("RESPONSE_GZIP_MIN_SIZE", "1024"))
+    # Максимум элементов в одном пакетном запросе /bulk
+    BULK_MAX_ITEMS: int = int(os.getenv("BULK_MAX_ITEMS", "10000"))
+    # Пул соединений (на один процесс uvicorn): постоянные + временные сверх них
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    # Сколько секунд ждать свободное соединение, прежде чем отдать ошибку
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Пересоздавать соединения старше N секунд (-1 - не пересоздавать)
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Проверять соединение (SELECT 1) перед выдачей из пула
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    # Логировать каждый SQL-запрос (только для отладки)
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+    # Прогрев при старте: схема, соединения пула, подготовленные запросы, кэш каталога
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Сколько соединений открыть заранее (по умолчанию - весь постоянный пул)
+    WARMUP_CONNECTIONS: int = int(os.getenv("WARMUP_CONNECTIONS", os.getenv("DB_POOL_SIZE", "5")))
+    # Пауза между повторами прогрева, если БД при старте недоступна
+    WARMUP_RETRY_SECONDS: float = float(os.getenv("WARMUP_RETRY_SECONDS", "10"))
+    # Окно дедупликации заявок, с: повторное нажатие с того же telegram_id вернёт
+    # уже созданную заявку (0 - выключено)
+    CONTACT_DEDUP_SECONDS: float = float(os.getenv("CONTACT_DEDUP_SECONDS", "600"))
+    # Ограничение частоты записи (token bucket): жетонов в секунду и запас на всплеск.
+    # Rate 0 - корзина этого вида выключена
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+    RATE_LIMIT_ROUTE_RATE: float = float(os.getenv("RATE_LIMIT_ROUTE_RATE", "200"))
+    RATE_LIMIT_ROUTE_BURST: float = float(os.getenv("RATE_LIMIT_ROUTE_BURST", "400"))
+    RATE_LIMIT_IP_RATE: float = float(os.getenv("RATE_LIMIT_IP_RATE", "5"))
+    RATE_LIMIT_IP_BURST: float = float(os.getenv("RATE_LIMIT_IP_BURST", "20"))
+    RATE_LIMIT_USER_RATE: float = float(os.getenv("RATE_LIMIT_USER_RATE", "0.2"))
+    RATE_LIMIT_USER_BURST: float = float(os.getenv("RATE_LIMIT_USER_BURST", "3"))
+    # Адреса/подсети обратных прокси, чьему X-Forwarded-For верить (uvicorn --forwarded-allow-ips).
+    # Без этого за прокси у всех клиентов один IP - адрес прокси; "*" - клиент сам выбирает свой IP
+    FORWARDED_ALLOW_IPS: str = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+    # Сколько ключей (IP, пользователей, маршрутов) каждого вида держать в памяти
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+    # Как часто сверять mtime HTML-страниц в памяти, с (0 - только POST /api/admin/pages/reload)
+    PAGES_CHECK_SECONDS: float = float(os.getenv("PAGES_CHECK_SECONDS", "2"))
+    # Страницы продуктов с каталогом, встроенным в HTML (без отдельного запроса к API)
+    SSR_ENABLED: bool = os.getenv("SSR_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Каталог собранной статики и страниц (python src/assets.py)
+    ASSETS_DIR: str = os.getenv("ASSETS_DIR", "dist")
+    # Очередь записи заявок: ответ сразу после записи в журнал, INSERT пакетами в фоне
+    CONTACT_QUEUE_ENABLED: bool = os.getenv("CONTACT_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+    # Журнал очереди: у каждого процесса свой файл <путь>.<слот> (слот занимается через flock)
+    CONTACT_QUEUE_JOURNAL: str = os.getenv("CONTACT_QUEUE_JOURNAL", "contact_requests.journal")
+    # Заявки, которые БД отвергла (значение вне типа колонки и т.п.), - JSON-строки с причиной
+    CONTACT_QUEUE_REJECTED: str = os.getenv("CONTACT_QUEUE_REJECTED", "contact_requests.rejected")
+    # Сброс в БД каждые N мс или по накоплении M заявок
+    CONTACT_QUEUE_FLUSH_MS: int = int(os.getenv("CONTACT_QUEUE_FLUSH_MS", "200"))
+    CONTACT_QUEUE_BATCH_SIZE: int = int(os.getenv("CONTACT_QUEUE_BATCH_SIZE", "500"))
+    # fsync журнала до ответа на заявку: переживает и отключение питания, не только падение процесса
+    CONTACT_QUEUE_FSYNC: bool = os.getenv("CONTACT_QUEUE_FSYNC", "true").lower() in ("1", "true", "yes")
+    # Сколько мс собирать заявки в группу под один fsync
+    CONTACT_QUEUE_FSYNC_MS: float = float(os.getenv("CONTACT_QUEUE_FSYNC_MS", "2"))
+    # Размер кэша подготовленных запросов asyncpg на одно соединение
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "500"))
+
     @property
     def DATABASE_URL_asyncpg(self):
         """Для asyncpg (асинхронный драйвер)"""
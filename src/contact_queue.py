@@ -0,0 +1,380 @@
+"""Очередь записи заявок (write-behind) с журналом на диске
+
+Заявка дописывается строкой JSON в журнал и в очередь в памяти, после
+чего клиент сразу получает ответ. Фоновая задача пишет накопленные
+заявки в БД пакетами (каждые CONTACT_QUEUE_FLUSH_MS мс или по
+CONTACT_QUEUE_BATCH_SIZE заявок) и оставляет в журнале только ещё не
+записанные. При старте журнал перечитывается: заявки, которые процесс
+не успел записать до падения, уходят в БД первыми. У каждой заявки
+свой ingest_uid с уникальным индексом, поэтому повтор уже записанной
+заявки (упали между INSERT и сжатием журнала) дубля не создаст.
+
+fsync журнала групповой: заявки, пришедшие в пределах
+CONTACT_QUEUE_FSYNC_MS, ждут одного общего fsync (в отдельном потоке,
+event loop не блокируется) и только после него получают ответ.
+
+У каждого процесса (воркера uvicorn) свой журнал: <CONTACT_QUEUE_JOURNAL>.0,
+.1, ... - первый слот, блокировку которого (flock) удалось взять. Журналы
+без владельца (процесс упал или воркеров стало меньше) при старте
+забираются в очередь запускающегося процесса.
+
+Пакет, отвергнутый БД из-за самих данных (а не соединения), делится
+пополам, пока ошибка не сузится до отдельных заявок; они уходят в файл
+CONTACT_QUEUE_REJECTED, остальные записываются. Иначе одна такая заявка
+держала бы всю очередь за собой.
+"""
+import asyncio
+import glob
+import itertools
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy.exc import DBAPIError
+
+try:
+    import fcntl
+except ImportError:  # Windows: без блокировок, запускать одним процессом
+    fcntl = None
+
+from cache import table_versions
+from config import settings
+import database
+from repository import insert_contacts_batch
+
+# Классы SQLSTATE ошибок в самих данных: 22 - недопустимое значение, 23 - нарушение ограничения
+DATA_ERROR_CLASSES = ("22", "23")
+
+
+def is_data_error(e: Exception) -> bool:
+    """Пакет отвергнут из-за заявок (повтор не поможет), а не из-за соединения с БД"""
+    if not isinstance(e, DBAPIError):
+        return False
+    sqlstate = getattr(e.orig, "sqlstate", None) or ""
+    # Значение, которое драйвер не смог закодировать (число вне BIGINT), - ValueError до отправки в БД
+    return sqlstate[:2] in DATA_ERROR_CLASSES or isinstance(e.orig.__cause__, ValueError)
+
+
+class ContactQueue:
+    """Заявки, принятые, но ещё не записанные в БД, и их журнал"""
+
+    def __init__(
+        self, journal_path: str, batch_size: int, flush_interval: float, fsync: bool = True, fsync_interval: float = 0.002,
+        rejected_path: str | None = None,
+    ):
+        self.journal_base = journal_path
+        self.journal_path = journal_path
+        self.rejected_path = rejected_path or journal_path + ".rejected"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._pending: list[dict] = []
+        self._journal = None
+        self._journal_lock = None
+        # Ожидание ближайшего группового fsync (None - fsync не запланирован)
+        self._sync_waiter: asyncio.Future | None = None
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.accepted = 0
+        self.replayed = 0
+        self.flushed = 0
+        self.batches = 0
+        self.errors = 0
+        self.rejected = 0
+        self.syncs = 0
+        self.last_error: str | None = None
+
+    # -------------------------------------------
+    # Журнал
+    # -------------------------------------------
+
+    def _write(self, handle, line: str, sync: bool = False):
+        handle.write(line)
+        handle.flush()
+        if sync and self.fsync:
+            os.fsync(handle.fileno())
+
+    async def synced(self):
+        """Дождаться, пока принятые заявки окажутся на диске (один fsync на группу)"""
+        if not self.fsync:
+            return
+        waiter = self._sync_waiter
+        if waiter is None:
+            waiter = self._sync_waiter = asyncio.get_running_loop().create_future()
+            asyncio.create_task(self._group_sync(waiter))
+        await asyncio.shield(waiter)
+
+    async def _group_sync(self, waiter: asyncio.Future):
+        # Даём подойти остальным заявкам группы, дальше пришедшие ждут следующий fsync
+        await asyncio.sleep(self.fsync_interval)
+        self._sync_waiter = None
+        if self._journal is None:
+            # Очередь остановлена: stop() уже переписал журнал с fsync
+            waiter.set_result(None)
+            return
+        # Копия дескриптора: _compact может закрыть и подменить журнал, пока идёт fsync
+        # (все заявки старого файла к подмене уже лежат в новом с fsync)
+        fd = os.dup(self._journal.fileno())
+        try:
+            await asyncio.to_thread(os.fsync, fd)
+            self.syncs += 1
+            waiter.set_result(None)
+        except Exception as e:
+            waiter.set_exception(e)
+            waiter.exception()  # помечаем как прочитанное, если ожидающих нет
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _try_lock(path: str):
+        """Открытый файл блокировки path.lock или None, если журнал занят живым процессом"""
+        lock = open(path + ".lock", "a")
+        if fcntl is None:
+            return lock
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+        return lock
+
+    def _claim_journal(self) -> tuple[str, object]:
+        """Первый свободный слот журнала этого процесса"""
+        if fcntl is None:
+            path = f"{self.journal_base}.0"
+            return path, self._try_lock(path)
+        for slot in itertools.count():
+            path = f"{self.journal_base}.{slot}"
+            lock = self._try_lock(path)
+            if lock is not None:
+                return path, lock
+
+    def _orphan_journals(self) -> list[tuple[str, object]]:
+        """Журналы других слотов, чьи процессы уже не работают (блокировка свободна)
+
+        Сюда же попадает журнал без номера слота от прошлых версий.
+        """
+        if fcntl is None:
+            return []
+        orphans = []
+        for path in [self.journal_base] + sorted(glob.glob(glob.escape(self.journal_base) + ".*")):
+            if path == self.journal_path or path.endswith((".lock", ".tmp", ".rejected")) or not os.path.exists(path):
+                continue
+            lock = self._try_lock(path)
+            if lock is not None:
+                orphans.append((path, lock))
+        return orphans
+
+    @staticmethod
+    def _replay(path: str) -> list[dict]:
+        """Незаписанные заявки из журнала; недописанная строка (падение во время записи) пропускается"""
+        if not os.path.exists(path):
+            return []
+        records = []
+        with open(path, encoding="utf-8") as journal:
+            for line_number, line in enumerate(journal, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    record["created_at"] = datetime.fromisoformat(record["created_at"])
+                except (ValueError, KeyError) as e:
+                    print(f"⚠️ Журнал заявок, строка {line_number} пропущена: {e}")
+                    continue
+                records.append(record)
+        return records
+
+    async def _compact(self):
+        """Переписать журнал: только заявки, которые ещё ждут записи в БД
+
+        Новый файл пишется рядом (запись и fsync - в отдельном потоке) и
+        атомарно подменяет старый (os.replace). Заявки, принятые во время
+        fsync, дописываются следующим кругом, пока круг не пройдёт без новых:
+        к подмене все заявки старого файла лежат в новом с fsync.
+        """
+        tmp_path = self.journal_path + ".tmp"
+        tmp = open(tmp_path, "w", encoding="utf-8")
+        written = 0
+        try:
+            while True:
+                lines = "".join(self._encode(record) for record in self._pending[written:])
+                written = len(self._pending)
+                await asyncio.to_thread(self._write, tmp, lines, True)
+                if written == len(self._pending):
+                    break
+        except BaseException:
+            tmp.close()
+            raise
+        # Дальше без await: enqueue не вклинится между последним кругом и подменой
+        if self._journal:
+            self._journal.close()
+        os.replace(tmp_path, self.journal_path)
+        self._journal = tmp
+
+    def _write_rejected(self, rejected: list[tuple[dict, str]]):
+        """Дописать отвергнутые БД заявки с причиной в CONTACT_QUEUE_REJECTED (с fsync)"""
+        with open(self.rejected_path, "a", encoding="utf-8") as f:
+            self._write(f, "".join(self._encode(record, error=error) for record, error in rejected), sync=True)
+
+    @staticmethod
+    def _encode(record: dict, **extra) -> str:
+        return json.dumps({**record, "created_at": record["created_at"].isoformat(), **extra}, ensure_ascii=False) + "\n"
+
+    # -------------------------------------------
+    # Приём и запись
+    # -------------------------------------------
+
+    def enqueue(self, contact: dict) -> str:
+        """Принять заявку: запись в журнал (в БД - позже пакетом)
+
+        Перед ответом клиенту нужно дождаться synced() - до fsync запись
+        переживает падение процесса, но не отключение питания.
+        """
+        if self._journal is None:
+            raise RuntimeError("Очередь заявок не запущена")
+        record = {
+            **contact,
+            "status": "new",
+            # Время приёма, а не записи в БД: порядок заявок в админке не меняется
+            "created_at": datetime.now(),
+            "ingest_uid": uuid.uuid4().hex,
+        }
+        self._write(self._journal, self._encode(record))
+        self._pending.append(record)
+        self.accepted += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return record["ingest_uid"]
+
+    async def _insert(self, batch: list[dict]) -> int:
+        async with database.async_session_factory() as session:
+            result = await session.execute(insert_contacts_batch, batch)
+            inserted = len(result.all())
+            await session.commit()
+        return inserted
+
+    async def _insert_isolating(self, batch: list[dict]) -> tuple[int, list[tuple[dict, str]]]:
+        """Записать пакет, отделив заявки, которые БД отвергает (делением пополам)
+
+        (записано, [(заявка, ошибка)]); ошибка соединения - исключение. Если
+        соединение пропало на середине, повтор пакета записанные половины не
+        задвоит: ingest_uid уже есть в БД.
+        """
+        try:
+            return await self._insert(batch), []
+        except Exception as e:
+            if not is_data_error(e):
+                raise
+            if len(batch) == 1:
+                return 0, [(batch[0], str(e.orig))]
+        middle = len(batch) // 2
+        inserted_left, rejected_left = await self._insert_isolating(batch[:middle])
+        inserted_right, rejected_right = await self._insert_isolating(batch[middle:])
+        return inserted_left + inserted_right, rejected_left + rejected_right
+
+    async def flush(self) -> int:
+        """Записать один пакет (не больше batch_size заявок); 0 - нечего писать или ошибка БД"""
+        async with self._flush_lock:
+            batch = self._pending[:self.batch_size]
+            if not batch:
+                return 0
+            try:
+                inserted, rejected = await self._insert_isolating(batch)
+            except Exception as e:
+                # Заявки остаются в очереди и журнале до следующей попытки
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Error in contact_queue.flush: {e}")
+                return 0
+
+            if rejected:
+                # В файл отвергнутых - до того, как сжатие уберёт их из журнала
+                await asyncio.to_thread(self._write_rejected, rejected)
+                self.rejected += len(rejected)
+                print(f"⚠️ Заявки отвергнуты БД ({len(rejected)}), сохранены в {self.rejected_path}: {rejected[0][1]}")
+            del self._pending[:len(batch)]
+            self.last_error = None
+            await self._compact()
+            self.flushed += len(batch) - len(rejected)
+            self.batches += 1
+            if inserted:
+                table_versions.bump("contact_requests")
+            return len(batch)
+
+    async def _run(self):
+        failures = 0
+        while True:
+            # БД недоступна - повторяем реже (до 5 с), а не каждые flush_interval
+            interval = min(self.flush_interval * 2 ** failures, 5.0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending and await self.flush():
+                pass
+            failures = failures + 1 if self._pending and self.last_error else 0
+
+    async def start(self):
+        """Занять слот журнала, поднять заявки из него и из журналов без владельца,
+        запустить фоновую запись"""
+        self.journal_path, self._journal_lock = self._claim_journal()
+        records = self._replay(self.journal_path)
+        orphans = self._orphan_journals()
+        for path, _ in orphans:
+            records += self._replay(path)
+        self._pending = records + self._pending
+        self.replayed += len(records)
+        # Чужие журналы удаляем только после того, как их заявки легли в свой (с fsync)
+        await self._compact()
+        for path, lock in orphans:
+            os.remove(path)
+            lock.close()
+        if records:
+            print(f"📥 Из журнала заявок восстановлено: {len(records)}")
+            self._wakeup.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        """Остановить фоновую запись, дописав очередь (что не успели - останется в журнале)"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline and await self.flush():
+            pass
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+        if self._journal_lock:
+            self._journal_lock.close()
+            self._journal_lock = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._journal is not None,
+            "journal": self.journal_path,
+            "pending": len(self._pending),
+            "accepted": self.accepted,
+            "replayed": self.replayed,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "syncs": self.syncs,
+            "last_error": self.last_error,
+        }
+
+
+contact_queue = ContactQueue(
+    settings.CONTACT_QUEUE_JOURNAL,
+    batch_size=settings.CONTACT_QUEUE_BATCH_SIZE,
+    flush_interval=settings.CONTACT_QUEUE_FLUSH_MS / 1000,
+    fsync=settings.CONTACT_QUEUE_FSYNC,
+    fsync_interval=settings.CONTACT_QUEUE_FSYNC_MS / 1000,
+    rejected_path=settings.CONTACT_QUEUE_REJECTED,
+)
@@ -1,22 +1,151 @@
 import asyncio
+import threading
+import time
 from typing import Annotated
 
-from sqlalchemy import String, create_engine, text
+from sqlalchemy import String, create_engine, make_url, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from config import settings
 
+# ===========================================
+# МЕТРИКИ ПУЛА СОЕДИНЕНИЙ
+# ===========================================
+
+# Верхние границы корзин гистограммы ожидания соединения, секунды
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics:
+    """Счётчики выдачи соединений из пула: ожидающие, время ожидания, таймауты"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def started(self):
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def finished(self, elapsed: float, outcome: str = "ok"):
+        """outcome: ok - соединение выдано, timeout - истёк DB_POOL_TIMEOUT, error - не удалось подключиться"""
+        with self._lock:
+            self.waiting -= 1
+            if outcome == "timeout":
+                self.timeouts += 1
+                return
+            if outcome == "error":
+                self.errors += 1
+                return
+            self.checkouts += 1
+            self.wait_total += elapsed
+            self.wait_max = max(self.wait_max, elapsed)
+            index = next((i for i, bound in enumerate(WAIT_BUCKETS) if elapsed <= bound), len(WAIT_BUCKETS))
+            self.buckets[index] += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            histogram = {f"le_{bound * 1000:g}ms": count for bound, count in zip(WAIT_BUCKETS, self.buckets)}
+            histogram["inf"] = self.buckets[-1]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "wait_histogram": histogram,
+            }
+
+
+class MeteredPoolMixin:
+    """Замер времени получения соединения из пула (_do_get)
+
+    Метрики - атрибут класса, поэтому переживают pool.recreate() при dispose().
+    """
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        self.metrics.started()
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.finished(time.perf_counter() - started, "timeout")
+            raise
+        except BaseException:
+            self.metrics.finished(time.perf_counter() - started, "error")
+            raise
+        self.metrics.finished(time.perf_counter() - started)
+        return connection
+
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    metrics = PoolMetrics()
+
+
+class MeteredAsyncPool(MeteredPoolMixin, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+
+def pool_options() -> dict:
+    """Параметры пула из настроек (общие для sync и async движков)"""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def pool_status(engine) -> dict:
+    """Состояние пула движка: занятые/свободные/сверх лимита соединения и метрики ожидания"""
+    pool = engine.pool
+    status = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "timeout": pool.timeout(),
+    }
+    if isinstance(pool, MeteredPoolMixin):
+        status.update(pool.metrics.as_dict())
+    return status
+
+# ===========================================
+# ДВИЖКИ
+# ===========================================
+
 sync_engine = create_engine(
     url=settings.DATABASE_URL_psycopg,
-    echo=True,
-    # pool_size=5,
-    # max_overflow=10,
+    echo=settings.DB_ECHO,
+    poolclass=MeteredQueuePool,
+    **pool_options(),
 )
 
+# Запросы из repository.py повторяются, asyncpg держит их подготовленными на соединении
 async_engine = create_async_engine(
-    url=settings.DATABASE_URL_asyncpg,
-    echo=True,
+    url=make_url(settings.DATABASE_URL_asyncpg).update_query_dict({
+        "prepared_statement_cache_size": str(settings.DB_PREPARED_STATEMENT_CACHE_SIZE)
+    }),
+    echo=settings.DB_ECHO,
+    poolclass=MeteredAsyncPool,
+    **pool_options(),
 )
 
 session_factory = sessionmaker(sync_engine)
@@ -0,0 +1,227 @@
+"""Потоковый импорт CSV/NDJSON в таблицы каталога и заявок через COPY
+
+Файл читается кусками, строки проверяются по одной и сразу уходят
+в asyncpg copy_records_to_table - целиком файл в памяти не держится.
+
+Запуск из командной строки:
+    python src/importer.py consumer_loans products.csv
+    python src/importer.py contact_requests requests.ndjson --format ndjson
+"""
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+
+from pydantic import ValidationError
+
+sys.path.append(os.path.dirname(__file__))
+from database import async_engine
+from parsers import numeric_columns
+from schemas import (
+    ContactRequestImport, DepositCreate, LoanCreate,
+    CONTACT_COLUMNS, DEPOSIT_COLUMNS, DEPOSIT_NUMERIC_COLUMNS, LOAN_COLUMNS, LOAN_NUMERIC_COLUMNS,
+)
+
+# Таблица -> (модель для проверки строки, колонки COPY)
+IMPORT_TABLES = {
+    "consumer_loans": (LoanCreate, LOAN_COLUMNS + LOAN_NUMERIC_COLUMNS),
+    "mortgage_loans": (LoanCreate, LOAN_COLUMNS + LOAN_NUMERIC_COLUMNS),
+    "preferential_loans": (LoanCreate, LOAN_COLUMNS + LOAN_NUMERIC_COLUMNS),
+    "deposits": (DepositCreate, DEPOSIT_COLUMNS + DEPOSIT_NUMERIC_COLUMNS),
+    "contact_requests": (ContactRequestImport, CONTACT_COLUMNS),
+}
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Сколько ошибок по строкам возвращать в ответе (остальные только считаются)
+MAX_REPORTED_ERRORS = 100
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Защита от незакрытой кавычки: запись CSV длиннее этого числа строк отклоняется
+MAX_CSV_RECORD_LINES = 1000
+
+
+class ImportReport:
+    """Итог импорта: сколько строк загружено и какие отклонены"""
+
+    def __init__(self):
+        self.imported = 0
+        self.copied = 0  # отданы в COPY; загруженными становятся после коммита
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line_no: int, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "errors": message})
+
+    def as_dict(self) -> dict:
+        return {"imported": self.imported, "rejected": self.rejected, "errors": self.errors}
+
+
+async def iter_lines(chunks):
+    """Байтовые куски -> строки (UTF-8, с BOM или без)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_csv_records(lines):
+    """Строки CSV -> (номер строки, dict) по заголовку
+
+    Поле в кавычках может содержать перевод строки, поэтому физические строки
+    склеиваются, пока число кавычек не станет чётным.
+    """
+    header = None
+    pending, start_no, line_no = [], 0, 0
+    async for line in lines:
+        line_no += 1
+        if not pending:
+            start_no = line_no
+        pending.append(line)
+        record = "\n".join(pending)
+        if record.count('"') % 2:
+            if len(pending) >= MAX_CSV_RECORD_LINES:
+                pending = []
+                yield start_no, None
+            continue
+        pending = []
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield start_no, dict(zip(header, values))
+    if pending:
+        yield start_no, None
+
+
+async def iter_ndjson_records(lines):
+    """Строки NDJSON -> (номер строки, dict)"""
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError:
+            yield line_no, None
+
+
+def parse_advantage_cell(value):
+    """advantage в CSV: JSON-массив или значения через '|'"""
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    if value.startswith("["):
+        return json.loads(value)
+    return [item.strip() for item in value.split("|") if item.strip()]
+
+
+def to_copy_record(table_name: str, obj) -> tuple:
+    """Проверенная модель -> кортеж значений в порядке колонок COPY"""
+    _, columns = IMPORT_TABLES[table_name]
+    row = obj.model_dump()
+    if "rate" in row:
+        row.update(numeric_columns(row))
+    if "advantage" in row:
+        # JSONB кодек драйвера принимает строку JSON
+        row["advantage"] = json.dumps(row["advantage"], ensure_ascii=False)
+    if table_name == "contact_requests" and row["created_at"] is None:
+        row["created_at"] = datetime.now()
+    return tuple(row[column] for column in columns)
+
+
+async def iter_copy_records(table_name: str, records, report: ImportReport):
+    """Проверка строк по одной: годные отдаются в COPY, остальные - в отчёт"""
+    model, _ = IMPORT_TABLES[table_name]
+    async for line_no, data in records:
+        if not isinstance(data, dict):
+            report.reject(line_no, "Строка не разобрана")
+            continue
+        # Пустая ячейка CSV = значение по умолчанию
+        data = {key: value for key, value in data.items() if key and value != ""}
+        try:
+            if "advantage" in data:
+                data["advantage"] = parse_advantage_cell(data["advantage"])
+            obj = model.model_validate(data)
+        except ValidationError as e:
+            report.reject(line_no, e.errors(include_url=False, include_context=False, include_input=False))
+            continue
+        except ValueError as e:
+            report.reject(line_no, str(e))
+            continue
+        report.copied += 1
+        yield to_copy_record(table_name, obj)
+
+
+async def import_stream(table_name: str, chunks, file_format: str = "csv") -> dict:
+    """Загрузить поток байтов (CSV/NDJSON) в таблицу одной транзакцией COPY"""
+    if table_name not in IMPORT_TABLES:
+        raise ValueError(f"Импорт в таблицу {table_name} не поддерживается")
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат {file_format}")
+
+    _, columns = IMPORT_TABLES[table_name]
+    lines = iter_lines(chunks)
+    records = iter_csv_records(lines) if file_format == "csv" else iter_ndjson_records(lines)
+    report = ImportReport()
+
+    async with async_engine.connect() as conn:
+        raw_connection = await conn.get_raw_connection()
+        driver = raw_connection.driver_connection
+        async with driver.transaction():
+            await driver.copy_records_to_table(
+                table_name,
+                records=iter_copy_records(table_name, records, report),
+                columns=list(columns),
+            )
+    report.imported = report.copied
+    return report.as_dict()
+
+
+async def iter_file_chunks(path: str):
+    """Файл с диска кусками по READ_CHUNK_SIZE"""
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_CHUNK_SIZE):
+            yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Импорт CSV/NDJSON в таблицы AurumBank через COPY")
+    parser.add_argument("table", choices=sorted(IMPORT_TABLES))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, default=None,
+                        help="по умолчанию определяется по расширению файла")
+    args = parser.parse_args()
+
+    file_format = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+
+    async def run():
+        try:
+            return await import_stream(args.table, iter_file_chunks(args.path), file_format)
+        finally:
+            await async_engine.dispose()
+
+    report = asyncio.run(run())
+    print(f"✅ Загружено: {report['imported']}, отклонено: {report['rejected']}")
+    for error in report["errors"]:
+        print(f"   строка {error['line']}: {error['errors']}")
+
+
+if __name__ == "__main__":
+    main()
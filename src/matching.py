@@ -0,0 +1,226 @@
+"""Подбор продуктов под сумму и срок по индексу в памяти
+
+Для каждой таблицы каталога продукты отсортированы по верхней границе
+суммы: bisect отсекает всё, что меньше запрошенной суммы, остальные
+условия проверяются масками NumPy по срезу. Индекс перестраивается
+только при смене версий таблиц (запись через API) или по истечении TTL
+кэша каталога - сам запрос подбора в БД не ходит.
+"""
+import asyncio
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+from cache import catalog_cache
+from calculator import capitalization_periods, project_deposits
+from config import settings
+from parsers import product_numbers
+from repository import LOAN_TABLES
+
+# Цель подбора -> таблицы
+PURPOSES = {
+    "loan": LOAN_TABLES,
+    "consumer": ("consumer_loans",),
+    "mortgage": ("mortgage_loans",),
+    "preferential": ("preferential_loans",),
+    "deposit": ("deposits",),
+    "any": LOAN_TABLES + ("deposits",),
+}
+
+# Поля продукта, которые попадают в ответ подбора
+PRODUCT_FIELDS = ("id", "name", "rate", "term", "amount", "min_amount", "max_amount", "capitalization")
+
+
+class TableIndex:
+    """Продукты одной таблицы, упорядоченные по максимальной сумме"""
+
+    def __init__(self, table_name: str, items: list[dict]):
+        self.table_name = table_name
+        is_deposit = table_name == "deposits"
+        rows = []
+        for item in items:
+            numbers = product_numbers(item)
+            max_amount = numbers.get("max_amount_byn" if is_deposit else "amount_max_byn")
+            rows.append((
+                np.inf if max_amount is None else max_amount,
+                numbers.get("min_amount_byn") or 0.0,
+                np.nan if numbers["term_months"] is None else numbers["term_months"],
+                np.nan if numbers["rate_pct"] is None else numbers["rate_pct"],
+                capitalization_periods(item.get("capitalization")) if is_deposit else 0,
+                {field: item[field] for field in PRODUCT_FIELDS if field in item},
+            ))
+        rows.sort(key=lambda row: row[0])
+
+        self.max_amounts = [row[0] for row in rows]  # для bisect
+        self.max_amount_array = np.array(self.max_amounts, dtype=np.float64)
+        self.min_amounts = np.array([row[1] for row in rows], dtype=np.float64)
+        self.terms = np.array([row[2] for row in rows], dtype=np.float64)
+        self.rates = np.array([row[3] for row in rows], dtype=np.float64)
+        self.periods = np.array([row[4] for row in rows], dtype=np.int64)
+        self.products = [row[5] for row in rows]
+
+    def __len__(self):
+        return len(self.products)
+
+    def candidates(self, amount: float, months: int) -> np.ndarray:
+        """Позиции продуктов, подходящих по сумме и сроку
+
+        Кредит: сумма не больше максимальной, срок продукта не меньше запрошенного
+        (срок не распознан - не ограничиваем). Вклад: сумма в [min, max],
+        срок вклада не длиннее горизонта.
+        """
+        start = bisect_left(self.max_amounts, amount)
+        part = slice(start, None)
+        mask = (self.min_amounts[part] <= amount) & ~np.isnan(self.rates[part])
+        terms = self.terms[part]
+        if self.table_name == "deposits":
+            mask &= np.isnan(terms) | (terms <= months)
+        else:
+            mask &= np.isnan(terms) | (terms >= months)
+        return start + np.flatnonzero(mask)
+
+
+class MatchIndex:
+    """Индексы всех таблиц каталога + версии, по которым они построены"""
+
+    def __init__(self, cache, ttl: float):
+        self.cache = cache
+        self.versions = cache.versions
+        self.ttl = ttl
+        self._tables: dict[str, TableIndex] = {}
+        self._built_versions: dict[str, int] | None = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+        self.builds = 0
+
+    def _current_versions(self, table_names) -> dict[str, int]:
+        return {table_name: self.versions.get(table_name) for table_name in table_names}
+
+    def is_stale(self, table_names) -> bool:
+        if self._built_versions is None:
+            return True
+        if self.ttl > 0 and time.monotonic() - self._built_at >= self.ttl:
+            return True
+        return self._built_versions != self._current_versions(table_names)
+
+    async def ensure(self, loaders: dict):
+        """Перестроить индекс, если изменились версии таблиц (loaders: таблица -> async loader)"""
+        if not self.is_stale(loaders):
+            return
+        async with self._lock:
+            if not self.is_stale(loaders):
+                return
+            before = self._current_versions(loaders)
+            results = await asyncio.gather(*(loader() for loader in loaders.values()))
+            # Загрузчики при ошибке БД отдают [] и кэш не заполняют: для такой
+            # таблицы оставляем прежний индекс, а версии не запоминаем - следующий
+            # запрос попробует снова, а не будет отвечать пустым индексом до TTL
+            loaded = {table_name: self.cache.is_fresh(table_name) for table_name in loaders}
+            self._tables = {
+                table_name: TableIndex(table_name, items)
+                if loaded[table_name] or table_name not in self._tables else self._tables[table_name]
+                for table_name, items in zip(loaders, results)
+            }
+            # Загрузка могла поднять версию (кэш перечитал таблицу) - тогда
+            # запоминаем старые версии, и следующий запрос перестроит индекс из кэша
+            after = self._current_versions(loaders)
+            if all(loaded.values()):
+                self._built_versions = after if after == before else before
+            else:
+                self._built_versions = None
+            self._built_at = time.monotonic()
+            self.builds += 1
+
+    def match(self, amount: float, months: int, purpose: str = "loan", limit: int = 10) -> dict:
+        """Лучшие кредиты (меньший платёж) и/или вклады (большая доходность)
+
+        В каждой таблице отбираются limit лучших через argpartition, словари
+        ответа строятся только для них.
+        """
+        loans, deposits = [], []
+        for table_name in PURPOSES[purpose]:
+            index = self._tables.get(table_name)
+            if not index:
+                continue
+            positions = index.candidates(amount, months)
+            if table_name == "deposits":
+                deposits.extend(self.score_deposits(index, positions, amount, months, limit))
+            else:
+                loans.extend(self.score_loans(index, positions, amount, months, limit))
+
+        result = {}
+        if any(table_name in LOAN_TABLES for table_name in PURPOSES[purpose]):
+            loans.sort(key=lambda item: (item["monthly_payment"], item["rate_pct"]))
+            result["loans"] = loans[:limit]
+        if "deposits" in PURPOSES[purpose]:
+            deposits.sort(key=lambda item: (-item["effective_yield_pct"], -item["income"]))
+            result["deposits"] = deposits[:limit]
+        return result
+
+    @staticmethod
+    def top(scores: np.ndarray, limit: int) -> np.ndarray:
+        """Индексы limit наименьших значений scores, по возрастанию"""
+        if len(scores) > limit:
+            best = np.argpartition(scores, limit - 1)[:limit]
+        else:
+            best = np.arange(len(scores))
+        return best[np.argsort(scores[best], kind="stable")]
+
+    @classmethod
+    def score_loans(cls, index: TableIndex, positions: np.ndarray, amount: float, months: int, limit: int) -> list[dict]:
+        """Аннуитетный платёж по каждому кандидату на запрошенные сумму и срок"""
+        if not len(positions):
+            return []
+        rates = index.rates[positions]
+        monthly = rates / 100 / 12
+        with np.errstate(divide="ignore", invalid="ignore"):
+            payment = np.where(
+                monthly > 0,
+                amount * monthly / (1 - (1 + monthly) ** -months),
+                amount / months,
+            )
+        headroom = index.max_amount_array[positions] - amount
+        return [
+            {
+                "table": index.table_name,
+                **index.products[positions[i]],
+                "rate_pct": float(rates[i]),
+                "monthly_payment": round(float(payment[i]), 2),
+                "overpayment": round(float(payment[i] * months - amount), 2),
+                "amount_headroom": None if np.isinf(headroom[i]) else round(float(headroom[i]), 2),
+            }
+            for i in cls.top(payment, limit)
+        ]
+
+    @classmethod
+    def score_deposits(cls, index: TableIndex, positions: np.ndarray, amount: float, months: int, limit: int) -> list[dict]:
+        """Итог и эффективная доходность вклада на его срок (не длиннее горизонта)"""
+        if not len(positions):
+            return []
+        rates = index.rates[positions]
+        terms = index.terms[positions]
+        placement = np.where(np.isnan(terms), months, terms)
+        balance, effective_yield = project_deposits(amount, rates, index.periods[positions], placement)
+        return [
+            {
+                "table": index.table_name,
+                **index.products[positions[i]],
+                "rate_pct": float(rates[i]),
+                "months": int(placement[i]),
+                "final_balance": round(float(balance[i]), 2),
+                "income": round(float(balance[i] - amount), 2),
+                "effective_yield_pct": round(float(effective_yield[i]), 3),
+            }
+            for i in cls.top(-effective_yield, limit)
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "builds": self.builds,
+            "products": {table_name: len(index) for table_name, index in self._tables.items()},
+            "versions": self._built_versions,
+        }
+
+
+match_index = MatchIndex(catalog_cache, ttl=settings.CATALOG_CACHE_TTL)
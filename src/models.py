@@ -1,18 +1,50 @@
-from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, Text
+from datetime import datetime
+
+from sqlalchemy.orm import Mapped, declared_attr, mapped_column
+from sqlalchemy import BigInteger, Computed, DateTime, Float, Index, String, Text, func, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from database import Base
 
-class ConsumerLoan(Base):
-    __tablename__ = "consumer_loans"
-    
+# Поисковый вектор (русская морфология): название - вес A, преимущества - B, описание - C
+SEARCH_TSV_SQL = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(jsonb_to_tsvector('russian', advantage, '[\"string\"]'), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(details, '')), 'C')"
+)
+
+class LoanColumns:
+    """Общие колонки таблиц кредитов (consumer/mortgage/preferential)"""
+
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(100))  # Название кредита
     rate: Mapped[str] = mapped_column(String(50))   # Ставка/проценты
     term: Mapped[str] = mapped_column(String(50))   # Срок кредита
     amount: Mapped[str] = mapped_column(String(50)) # Сумма
-    advantage: Mapped[str] = mapped_column(Text)    # Преимущества
+    advantage: Mapped[list] = mapped_column(JSONB, server_default=text("'[]'::jsonb"))  # Преимущества
     details: Mapped[str] = mapped_column(Text)      # Детальное описание
-    
+
+    # Числа из строк отображения (parsers.numeric_columns) - для фильтров и сортировки в БД
+    rate_pct: Mapped[float | None] = mapped_column(Float)
+    term_months: Mapped[int | None] = mapped_column()
+    amount_max_byn: Mapped[float | None] = mapped_column(Float)
+
+    # Вычисляется PostgreSQL (GENERATED ... STORED), в API не отдаётся
+    search_tsv: Mapped[str | None] = mapped_column(TSVECTOR, Computed(SEARCH_TSV_SQL, persisted=True))
+
+    @declared_attr.directive
+    def __table_args__(cls):
+        return (
+            Index(f"idx_{cls.__tablename__}_rate_pct", "rate_pct"),
+            Index(f"idx_{cls.__tablename__}_term_months", "term_months"),
+            Index(f"idx_{cls.__tablename__}_amount_max_byn", "amount_max_byn"),
+            Index(f"idx_{cls.__tablename__}_search", "search_tsv", postgresql_using="gin"),
+            # jsonb_path_ops: компактный GIN только под @> (фильтр ?advantage=)
+            Index(
+                f"idx_{cls.__tablename__}_advantage", "advantage",
+                postgresql_using="gin", postgresql_ops={"advantage": "jsonb_path_ops"},
+            ),
+        )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -21,5 +53,71 @@ class ConsumerLoan(Base):
             "term": self.term,
             "amount": self.amount,
             "advantage": self.advantage,
-            "details": self.details
-        }
\ No newline at end of file
+            "details": self.details,
+            "rate_pct": self.rate_pct,
+            "term_months": self.term_months,
+            "amount_max_byn": self.amount_max_byn
+        }
+
+class ConsumerLoan(LoanColumns, Base):
+    __tablename__ = "consumer_loans"
+
+class MortgageLoan(LoanColumns, Base):
+    __tablename__ = "mortgage_loans"
+
+class PreferentialLoan(LoanColumns, Base):
+    __tablename__ = "preferential_loans"
+
+class Deposit(Base):
+    __tablename__ = "deposits"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(100))
+    rate: Mapped[str] = mapped_column(String(50))
+    term: Mapped[str] = mapped_column(String(50))
+    min_amount: Mapped[str] = mapped_column(String(50))
+    max_amount: Mapped[str] = mapped_column(String(50))
+    capitalization: Mapped[str | None] = mapped_column(String(50), server_default="Ежемесячно")
+    advantage: Mapped[list] = mapped_column(JSONB, server_default=text("'[]'::jsonb"))
+    details: Mapped[str] = mapped_column(Text)
+
+    rate_pct: Mapped[float | None] = mapped_column(Float)
+    term_months: Mapped[int | None] = mapped_column()
+    min_amount_byn: Mapped[float | None] = mapped_column(Float)
+    max_amount_byn: Mapped[float | None] = mapped_column(Float)
+
+    search_tsv: Mapped[str | None] = mapped_column(TSVECTOR, Computed(SEARCH_TSV_SQL, persisted=True))
+
+    __table_args__ = (
+        Index("idx_deposits_rate_pct", rate_pct),
+        Index("idx_deposits_term_months", term_months),
+        Index("idx_deposits_min_amount_byn", min_amount_byn),
+        Index("idx_deposits_max_amount_byn", max_amount_byn),
+        Index("idx_deposits_search", search_tsv, postgresql_using="gin"),
+        Index(
+            "idx_deposits_advantage", advantage,
+            postgresql_using="gin", postgresql_ops={"advantage": "jsonb_path_ops"},
+        ),
+    )
+
+class ContactRequestRecord(Base):
+    __tablename__ = "contact_requests"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    telegram_id: Mapped[int] = mapped_column(BigInteger)
+    username: Mapped[str | None] = mapped_column(String(255))
+    first_name: Mapped[str | None] = mapped_column(String(255))
+    last_name: Mapped[str | None] = mapped_column(String(255))
+    # NOT NULL: по (created_at, id) идёт постраничный вывод, строка без даты в него не попадёт
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+    status: Mapped[str | None] = mapped_column(String(50), server_default="new")
+    # Ключ заявки из очереди записи (contact_queue): повтор из журнала не создаст дубль
+    ingest_uid: Mapped[str | None] = mapped_column(String(32))
+
+    # Индексы под постраничный вывод (created_at, id) и фильтры админки
+    __table_args__ = (
+        Index("idx_contact_requests_created", created_at.desc(), id.desc()),
+        Index("idx_contact_requests_status_created", status, created_at.desc(), id.desc()),
+        Index("idx_contact_requests_telegram_created", telegram_id, created_at.desc(), id.desc()),
+        Index("idx_contact_requests_ingest_uid", ingest_uid, unique=True),
+    )
@@ -0,0 +1,208 @@
+"""HTML-страницы Web App из памяти
+
+Страница читается с диска один раз и хранится вместе с gzip/brotli-
+вариантами, ETag и Last-Modified. Изменение файла замечается по mtime,
+но файл проверяется не чаще раза в PAGES_CHECK_SECONDS (0 - не
+проверяется, только явная перезагрузка) - запрос страницы на диск не ходит.
+
+Страницы продуктов (CATALOG_PAGES) отдаются с каталогом, встроенным в
+<script id="catalog-data" type="application/json">: скрипт страницы рисует
+карточки сразу, без второго запроса к API. Собранная страница живёт, пока
+кэш каталога отдаёт тот же список: запись через API (create_*/delete_*)
+сбрасывает кэш, и следующий запрос собирает страницу с новой версией.
+"""
+import gzip
+import hashlib
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+import orjson
+from fastapi import Request, Response
+
+from assets import page_path
+from cache import etag_matches
+from config import settings
+from responses import accepts_encoding
+
+try:
+    import brotli
+except ImportError:  # без brotli отдаём gzip
+    brotli = None
+
+# Маршрут -> файл страницы
+PAGES = {
+    "/": "index.html",
+    "/index.html": "index.html",
+    "/loans.html": "loans.html",
+    "/consumer_loans.html": "consumer_loans.html",
+    "/mortgage_loans.html": "mortgage_loans.html",
+    "/preferential_loans.html": "preferential_loans.html",
+    "/deposits.html": "deposits.html",
+    "/admin.html": "admin.html",
+}
+
+# Страница -> таблица каталога, которая встраивается в неё (SSR)
+CATALOG_PAGES = {
+    "consumer_loans.html": "consumer_loans",
+    "mortgage_loans.html": "mortgage_loans",
+    "preferential_loans.html": "preferential_loans",
+    "deposits.html": "deposits",
+}
+
+# Данные вставляются в <head>: к DOMContentLoaded, когда скрипты страниц их читают, они уже разобраны
+CATALOG_MARKER = b"</head>"
+
+# Сжатие: исходные страницы - максимальное (один раз), собранные с каталогом - быстрое (на каждую версию)
+SOURCE_LEVELS = (9, 11)
+RENDER_LEVELS = (6, 5)
+
+
+class Page:
+    """Содержимое страницы и его сжатые варианты"""
+
+    __slots__ = ("path", "mtime", "checked_at", "variants", "etag", "last_modified")
+
+    def __init__(self, body: bytes, mtime: float, path: str | None = None, levels: tuple = SOURCE_LEVELS):
+        self.path = path
+        self.mtime = mtime
+        self.checked_at = time.monotonic()
+        gzip_level, brotli_quality = levels
+        self.variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=gzip_level, mtime=0)}
+        if brotli:
+            self.variants["br"] = brotli.compress(body, quality=brotli_quality)
+        self.etag = f'"page-{hashlib.sha256(body).hexdigest()[:16]}"'
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+
+    @classmethod
+    def from_file(cls, path: str) -> "Page":
+        mtime = os.stat(path).st_mtime
+        with open(path, "rb") as f:
+            return cls(f.read(), mtime, path)
+
+    def is_modified(self, path: str) -> bool:
+        """Файл подменён или изменён с момента загрузки"""
+        try:
+            return path != self.path or os.stat(path).st_mtime != self.mtime
+        except FileNotFoundError:
+            return False  # удалили на ходу - отдаём последнюю версию
+
+    def body(self, accept_encoding: str | None) -> tuple[bytes, str | None]:
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accepts_encoding(accept_encoding, encoding):
+                return self.variants[encoding], encoding
+        return self.variants["identity"], None
+
+
+def embed_catalog(body: bytes, items: list) -> bytes:
+    """Вставить каталог в страницу; < > & экранируются, чтобы данные не закрыли тег"""
+    data = orjson.dumps(items, option=orjson.OPT_NON_STR_KEYS)
+    data = data.replace(b"<", b"\\u003c").replace(b">", b"\\u003e").replace(b"&", b"\\u0026")
+    tag = b'<script id="catalog-data" type="application/json">' + data + b"</script>\n"
+    return body.replace(CATALOG_MARKER, tag + CATALOG_MARKER, 1)
+
+
+class PageRegistry:
+    """Страницы по имени файла; перезагрузка по mtime или явно (reload)
+
+    catalog_loaders (таблица -> async loader) задаёт api.py: через них
+    страницы продуктов получают каталог (из кэша каталога).
+    """
+
+    def __init__(self, filenames, check_interval: float):
+        self.filenames = sorted(set(filenames))
+        self.check_interval = check_interval
+        self.catalog_loaders: dict = {}
+        self._pages: dict[str, Page] = {}
+        # Страница -> (ETag исходника, список каталога, страница с каталогом)
+        self._rendered: dict[str, tuple[str, list, Page]] = {}
+        self.loads = 0
+        self.renders = 0
+
+    def get(self, filename: str) -> Page:
+        page = self._pages.get(filename)
+        if page is not None:
+            if self.check_interval <= 0 or time.monotonic() - page.checked_at < self.check_interval:
+                return page
+            # Собранная страница (dist/pages) могла появиться после запуска
+            path = page_path(filename)
+            if not page.is_modified(path):
+                page.checked_at = time.monotonic()
+                return page
+        return self._load(filename)
+
+    def _load(self, filename: str) -> Page:
+        page = self._pages[filename] = Page.from_file(page_path(filename))
+        self.loads += 1
+        return page
+
+    async def render(self, filename: str) -> Page:
+        """Страница с встроенным каталогом (для страниц продуктов), иначе исходная"""
+        page = self.get(filename)
+        table_name = CATALOG_PAGES.get(filename)
+        loader = self.catalog_loaders.get(table_name)
+        if not settings.SSR_ENABLED or loader is None:
+            return page
+
+        items = await loader()
+        if not items:
+            # Пусто или ошибка БД (загрузчики тогда отдают []) - исходная
+            # страница, скрипт запросит каталог сам
+            return page
+
+        # Кэш каталога отдаёт один и тот же список, пока версия таблицы не сменилась
+        cached = self._rendered.get(filename)
+        if cached is not None and cached[0] == page.etag and cached[1] is items:
+            return cached[2]
+        rendered = Page(embed_catalog(page.variants["identity"], items), time.time(), levels=RENDER_LEVELS)
+        self._rendered[filename] = (page.etag, items, rendered)
+        self.renders += 1
+        return rendered
+
+    def reload(self) -> list[str]:
+        """Перечитать все страницы с диска (после правки HTML или пересборки)"""
+        for filename in self.filenames:
+            self._load(filename)
+        return self.filenames
+
+    def stats(self) -> dict:
+        return {
+            "check_interval": self.check_interval,
+            "loads": self.loads,
+            "renders": self.renders,
+            "pages": {filename: page.etag for filename, page in sorted(self._pages.items())},
+        }
+
+
+page_registry = PageRegistry(PAGES.values(), check_interval=settings.PAGES_CHECK_SECONDS)
+
+
+def not_modified_since(request: Request, page: Page) -> bool:
+    """If-None-Match, а без него - If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return etag_matches(if_none_match, page.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
+    try:
+        return int(page.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+async def serve_page(request: Request) -> Response:
+    """Страница по маршруту из PAGES (304, если у клиента та же версия)"""
+    page = await page_registry.render(PAGES[request.url.path])
+    headers = {
+        "ETag": page.etag,
+        "Last-Modified": page.last_modified,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if not_modified_since(request, page):
+        return Response(status_code=304, headers=headers)
+    body, encoding = page.body(request.headers.get("accept-encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="text/html", headers=headers)
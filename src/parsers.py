@@ -0,0 +1,77 @@
+"""Разбор строк отображения ('от 11.9%', 'до 7 лет', 'до 15 000 BYN') в числа"""
+import re
+
+# Число с пробелами-разделителями тысяч ("15 000") и дробной частью через точку/запятую
+NUMBER_RE = re.compile(r"\d{1,3}(?:[ \u00a0\u202f]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?")
+
+# Множитель перевода в месяцы по корню единицы срока
+TERM_UNITS = (
+    ("год", 12),
+    ("лет", 12),
+    ("мес", 1),
+    ("нед", 12 / 52),
+    ("дн", 12 / 365),
+    ("ден", 12 / 365),
+)
+
+
+def parse_numbers(value) -> list[float]:
+    """Все числа из строки по порядку"""
+    if value is None:
+        return []
+    numbers = []
+    for match in NUMBER_RE.findall(str(value)):
+        cleaned = re.sub(r"[ \u00a0\u202f]", "", match).replace(",", ".")
+        numbers.append(float(cleaned))
+    return numbers
+
+
+def parse_rate(value) -> float | None:
+    """'от 11.9%' -> 11.9"""
+    numbers = parse_numbers(value)
+    return numbers[0] if numbers else None
+
+
+def parse_amount(value) -> float | None:
+    """'до 15 000 BYN' -> 15000.0 (для диапазона - верхняя граница)"""
+    numbers = parse_numbers(value)
+    return max(numbers) if numbers else None
+
+
+def parse_amount_min(value) -> float | None:
+    """'от 100 BYN' -> 100.0 (для диапазона - нижняя граница)"""
+    numbers = parse_numbers(value)
+    return min(numbers) if numbers else None
+
+
+def parse_term_months(value) -> int | None:
+    """'до 7 лет' -> 84, '1.5 года' -> 18, '3-6 месяцев' -> 6 (верхняя граница)"""
+    numbers = parse_numbers(value)
+    if not numbers:
+        return None
+    text = str(value).lower()
+    multiplier = next((factor for unit, factor in TERM_UNITS if unit in text), 1)
+    return max(1, round(max(numbers) * multiplier))
+
+
+def numeric_columns(row: dict) -> dict:
+    """Числовые колонки продукта по его строкам отображения (для INSERT и бэкфилла)"""
+    values = {
+        "rate_pct": parse_rate(row.get("rate")),
+        "term_months": parse_term_months(row.get("term")),
+    }
+    if "amount" in row:
+        values["amount_max_byn"] = parse_amount(row["amount"])
+    if "min_amount" in row:
+        values["min_amount_byn"] = parse_amount_min(row["min_amount"])
+        values["max_amount_byn"] = parse_amount(row.get("max_amount"))
+    return values
+
+
+def product_numbers(item: dict) -> dict:
+    """Числовые колонки продукта: сохранённые в БД, а где пусто - разобранные из строк"""
+    values = numeric_columns(item)
+    for key in values:
+        if item.get(key) is not None:
+            values[key] = item[key]
+    return values
@@ -0,0 +1,225 @@
+"""Ограничение частоты записи (token bucket) в виде ASGI middleware
+
+Запрос на запись (POST/PUT/PATCH/DELETE в /api/) должен получить по
+жетону из трёх корзин: маршрута (на всех), IP клиента и telegram_id
+(только заявки). Нет жетона хотя бы в одной - 429 с Retry-After, и
+жетоны остальных корзин не тратятся. GET/HEAD проходят без проверок,
+поэтому чтение каталога во время наплыва записи не замедляется.
+
+Корзины хранятся в LRU по каждому виду ключа: памяти O(1) на активный
+ключ, не больше RATE_LIMIT_MAX_KEYS ключей. Вытесненная корзина при
+следующем запросе создаётся полной. Лимиты действуют в пределах одного
+процесса: при N воркерах суммарный лимит маршрута - N x RATE_LIMIT_ROUTE_RATE.
+
+За обратным прокси корзины по IP работают, только если uvicorn доверяет
+его X-Forwarded-For (FORWARDED_ALLOW_IPS), иначе все клиенты - один IP прокси.
+"""
+import math
+import re
+import time
+from collections import OrderedDict
+
+import orjson
+
+from config import settings
+
+WRITE_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+
+# POST-запросы, которые ничего не пишут (расчёт), - без ограничений
+EXEMPT_PATHS = frozenset(("/api/loans/calculate",))
+
+# Пути, telegram_id которых берётся из JSON-тела
+USER_PATHS = frozenset(("/api/contact-request",))
+
+# Больше этого тело ради telegram_id не читаем (заявка - несколько полей)
+MAX_USER_BODY = 16 * 1024
+
+# /api/deposits/15 -> /api/deposits/{id}: один маршрут - одна корзина
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class TokenBucket:
+    """rate жетонов в секунду, не больше burst в запасе"""
+
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated_at = now
+
+    def refill(self, rate: float, burst: float, now: float) -> float:
+        self.tokens = min(burst, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+        return self.tokens
+
+
+class BucketGroup:
+    """Корзины одного вида (маршрут / IP / пользователь) с вытеснением по LRU"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def bucket(self, key, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def wait_time(self, bucket: TokenBucket, now: float) -> float:
+        """Через сколько секунд в корзине будет жетон (0 - уже есть)"""
+        tokens = bucket.refill(self.rate, self.burst, now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """Корзины маршрутов, IP и пользователей"""
+
+    def __init__(self, route: BucketGroup, ip: BucketGroup, user: BucketGroup):
+        self.groups = {"route": route, "ip": ip, "user": user}
+        self.allowed = 0
+
+    def acquire(self, keys: dict) -> float:
+        """Взять по жетону из корзины каждого ключа (вид -> ключ)
+
+        0 - запрос пропущен; иначе секунды до повтора, жетоны не списаны.
+        """
+        now = time.monotonic()
+        checked = []
+        retry_after = 0.0
+        for kind, key in keys.items():
+            group = self.groups[kind]
+            if key is None or not group.enabled:
+                continue
+            bucket = group.bucket(key, now)
+            wait = group.wait_time(bucket, now)
+            if wait > 0:
+                group.rejected += 1
+                retry_after = max(retry_after, wait)
+            checked.append(bucket)
+        if retry_after:
+            return retry_after
+        for bucket in checked:
+            bucket.tokens -= 1
+        self.allowed += 1
+        return 0.0
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            **{
+                kind: {"rate": group.rate, "burst": group.burst, "keys": len(group), "rejected": group.rejected}
+                for kind, group in self.groups.items()
+            },
+        }
+
+
+rate_limiter = RateLimiter(
+    route=BucketGroup(settings.RATE_LIMIT_ROUTE_RATE, settings.RATE_LIMIT_ROUTE_BURST, settings.RATE_LIMIT_MAX_KEYS),
+    ip=BucketGroup(settings.RATE_LIMIT_IP_RATE, settings.RATE_LIMIT_IP_BURST, settings.RATE_LIMIT_MAX_KEYS),
+    user=BucketGroup(settings.RATE_LIMIT_USER_RATE, settings.RATE_LIMIT_USER_BURST, settings.RATE_LIMIT_MAX_KEYS),
+)
+
+
+async def read_body(receive) -> tuple[list, bytes]:
+    """Прочитать тело запроса; сообщения сохраняются, чтобы отдать их приложению"""
+    messages, chunks, size = [], [], 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size <= MAX_USER_BODY:
+            chunks.append(chunk)
+        if not message.get("more_body", False):
+            break
+    return messages, b"".join(chunks) if size <= MAX_USER_BODY else b""
+
+
+def body_telegram_id(body: bytes):
+    """telegram_id из JSON-тела заявки; 0 и ошибки разбора - без корзины пользователя"""
+    try:
+        telegram_id = orjson.loads(body).get("telegram_id")
+    except (orjson.JSONDecodeError, AttributeError):
+        return None
+    return telegram_id if isinstance(telegram_id, int) and telegram_id > 0 else None
+
+
+class RateLimitMiddleware:
+    """429 + Retry-After, если у маршрута, IP или пользователя кончились жетоны"""
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in WRITE_METHODS
+            or not scope["path"].startswith("/api/")
+            or scope["path"] in EXEMPT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        client = scope.get("client")
+        keys = {
+            "route": f"{scope['method']} {ID_SEGMENT.sub('/{id}', path)}",
+            # За обратным прокси адрес клиента подставляет uvicorn из X-Forwarded-For -
+            # только если прокси указан в FORWARDED_ALLOW_IPS (задаётся при развёртывании)
+            "ip": client[0] if client else None,
+            "user": None,
+        }
+        if path in USER_PATHS and self.limiter.groups["user"].enabled:
+            messages, body = await read_body(receive)
+            keys["user"] = body_telegram_id(body)
+            receive = replay(messages, receive)
+
+        retry_after = self.limiter.acquire(keys)
+        if retry_after:
+            await reject(send, retry_after)
+            return
+        await self.app(scope, receive, send)
+
+
+def replay(messages: list, receive):
+    """receive, который сначала отдаёт уже прочитанные сообщения"""
+    pending = list(messages)
+
+    async def replayed():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replayed
+
+
+async def reject(send, retry_after: float):
+    body = orjson.dumps({"status": "error", "message": "Слишком много запросов, повторите позже"})
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(math.ceil(retry_after)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
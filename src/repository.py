@@ -0,0 +1,373 @@
+"""Запросы к таблицам каталога и заявок на SQLAlchemy Core
+
+Имена таблиц проверяются по TABLES (строка от клиента в SQL не попадает).
+Каждый запрос строится один раз и переиспользуется: SQLAlchemy берёт его
+скомпилированную форму из кэша движка, а asyncpg - подготовленный
+statement из кэша соединения (DB_PREPARED_STATEMENT_CACHE_SIZE).
+"""
+from functools import lru_cache
+import re
+
+from sqlalchemy import (
+    ARRAY, DateTime, Float, Integer, String, Text, and_, any_, bindparam, cast, delete, func, insert, inspect,
+    literal_column, select, text, tuple_, union_all, update,
+)
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by, insert as pg_insert
+
+from models import ConsumerLoan, ContactRequestRecord, Deposit, MortgageLoan, PreferentialLoan
+
+TABLES = {
+    "consumer_loans": ConsumerLoan.__table__,
+    "mortgage_loans": MortgageLoan.__table__,
+    "preferential_loans": PreferentialLoan.__table__,
+    "deposits": Deposit.__table__,
+    "contact_requests": ContactRequestRecord.__table__,
+}
+
+LOAN_TABLES = ("consumer_loans", "mortgage_loans", "preferential_loans")
+
+# Числовая колонка "сколько можно взять/положить" для фильтра min_amount
+AMOUNT_COLUMNS = {table_name: "amount_max_byn" for table_name in LOAN_TABLES}
+AMOUNT_COLUMNS["deposits"] = "max_amount_byn"
+
+# Значения параметра sort (минус - по убыванию) -> числовая колонка
+SORT_FIELDS = ("rate", "amount", "term")
+
+contact_requests = TABLES["contact_requests"]
+
+
+def get_table(table_name: str):
+    """Table по имени; неизвестное имя - ValueError"""
+    try:
+        return TABLES[table_name]
+    except KeyError:
+        raise ValueError(f"Неизвестная таблица {table_name}") from None
+
+
+def public_columns(table):
+    """Колонки, которые отдаются в API (без служебных search_tsv и ingest_uid)"""
+    return [column for column in table.c if column.name not in ("search_tsv", "ingest_uid")]
+
+
+def ensure_table(sync_conn, table_name: str):
+    """CREATE TABLE/INDEX IF NOT EXISTS (для conn.run_sync)
+
+    Колонки, которых нет в уже существующей таблице, добавляются через
+    ALTER TABLE - все такие колонки nullable: обычные без значения по
+    умолчанию или вычисляемые (GENERATED ... STORED). Колонка, ставшая
+    NOT NULL, получает значение по умолчанию в пустых строках и SET NOT NULL.
+    """
+    table = get_table(table_name)
+    table.create(sync_conn, checkfirst=True)
+    existing = {column["name"]: column for column in inspect(sync_conn).get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in existing:
+            definition = column.type.compile(dialect=sync_conn.dialect)
+            if column.computed is not None:
+                definition += f" GENERATED ALWAYS AS ({column.computed.sqltext}) STORED"
+            sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {column.name} {definition}"))
+        elif existing[column.name]["nullable"] and not column.nullable and column.server_default is not None:
+            sync_conn.execute(text(f"UPDATE {table.name} SET {column.name} = DEFAULT WHERE {column.name} IS NULL"))
+            sync_conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} SET NOT NULL"))
+    for index in table.indexes:
+        index.create(sync_conn, checkfirst=True)
+
+
+def json_object(columns):
+    """json_build_object('col', col, ...) по колонкам таблицы/подзапроса"""
+    args = []
+    for column in columns:
+        args.extend((literal_column(f"'{column.name}'"), column))
+    return func.json_build_object(*args)
+
+
+def json_array(element, order_by, filter_=None):
+    """json_agg(element ORDER BY ...) как текст; для пустой выборки - '[]'"""
+    aggregate = func.json_agg(aggregate_order_by(element, *order_by))
+    if filter_ is not None:
+        aggregate = aggregate.filter(filter_)
+    return cast(func.coalesce(aggregate, text("'[]'::json")), Text)
+
+
+# ===========================================
+# КАТАЛОГ (КРЕДИТЫ И ВКЛАДЫ)
+# ===========================================
+
+@lru_cache(maxsize=None)
+def select_all(table_name: str):
+    table = get_table(table_name)
+    return select(*public_columns(table)).order_by(table.c.id)
+
+
+@lru_cache(maxsize=None)
+def select_all_json(table_name: str):
+    """Вся таблица одной строкой JSON-массива, собранной в PostgreSQL"""
+    table = get_table(table_name)
+    return select(json_array(json_object(public_columns(table)), (table.c.id,)))
+
+
+@lru_cache(maxsize=None)
+def select_by_id(table_name: str):
+    table = get_table(table_name)
+    return select(*public_columns(table)).where(table.c.id == bindparam("id"))
+
+
+def sort_column(table_name: str, sort: str):
+    """Колонка для sort=rate|amount|term (с '-' - по убыванию); неизвестное значение - ValueError"""
+    field = sort.lstrip("-")
+    if field not in SORT_FIELDS:
+        raise ValueError(f"sort должен быть одним из: {', '.join(SORT_FIELDS)} (с '-' для убывания)")
+    c = get_table(table_name).c
+    column = {"rate": c.rate_pct, "amount": c[AMOUNT_COLUMNS[table_name]], "term": c.term_months}[field]
+    return column.desc().nulls_last() if sort.startswith("-") else column.asc().nulls_last()
+
+
+@lru_cache(maxsize=None)
+def select_products(table_name: str, has_max_rate: bool, has_min_amount: bool, has_term_months: bool,
+                    sort: str | None = None, has_advantage: bool = False):
+    """Продукты с фильтрами по числовым колонкам (индексы B-tree) и преимуществам (GIN)
+
+    max_rate - ставка не выше, min_amount - можно взять/положить не меньше,
+    term_months - срок продукта не меньше запрошенного, advantage - массив
+    содержит все перечисленные преимущества (advantage @> '[...]').
+    """
+    table = get_table(table_name)
+    c = table.c
+    stmt = select(*public_columns(table))
+    if has_max_rate:
+        stmt = stmt.where(c.rate_pct <= bindparam("max_rate", type_=Float()))
+    if has_min_amount:
+        stmt = stmt.where(c[AMOUNT_COLUMNS[table_name]] >= bindparam("min_amount", type_=Float()))
+    if has_term_months:
+        stmt = stmt.where(c.term_months >= bindparam("term_months", type_=Integer()))
+    if has_advantage:
+        stmt = stmt.where(c.advantage.contains(bindparam("advantage", type_=JSONB())))
+    if sort:
+        stmt = stmt.order_by(sort_column(table_name, sort))
+    return stmt.order_by(c.id)
+
+
+@lru_cache(maxsize=None)
+def select_unparsed(table_name: str, numeric_columns: tuple):
+    """Строки, у которых числовые колонки ещё не заполнены (для бэкфилла)"""
+    table = get_table(table_name)
+    return select(*public_columns(table)).where(and_(*(table.c[name].is_(None) for name in numeric_columns)))
+
+
+@lru_cache(maxsize=None)
+def update_numeric(table_name: str, numeric_columns: tuple):
+    """UPDATE числовых колонок по id (executemany)"""
+    table = get_table(table_name)
+    return (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values({name: bindparam(name) for name in numeric_columns})
+    )
+
+
+@lru_cache(maxsize=None)
+def insert_returning_id(table_name: str):
+    """INSERT ... RETURNING id; со списком параметров SQLAlchemy склеивает
+    строки в многострочный VALUES и сохраняет порядок id"""
+    table = get_table(table_name)
+    return insert(table).returning(table.c.id, sort_by_parameter_order=True)
+
+
+@lru_cache(maxsize=None)
+def delete_by_id(table_name: str):
+    table = get_table(table_name)
+    return delete(table).where(table.c.id == bindparam("id"))
+
+
+@lru_cache(maxsize=None)
+def delete_many(table_name: str):
+    table = get_table(table_name)
+    ids = bindparam("ids", type_=ARRAY(Integer))
+    return delete(table).where(table.c.id == any_(ids)).returning(table.c.id)
+
+
+# ===========================================
+# ПОЛНОТЕКСТОВЫЙ ПОИСК И ФАСЕТЫ
+# ===========================================
+
+SEARCH_TABLES = ("consumer_loans", "mortgage_loans", "preferential_loans", "deposits")
+
+# Подсветка совпадений в ts_headline
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+
+
+def html_escape(column):
+    """& < > " -> HTML-сущности в SQL: в подсветке единственная разметка - <mark>
+
+    Парсер полнотекстового поиска считает сущности (&lt;) не словами,
+    поэтому совпадения в экранированном тексте подсвечиваются так же.
+    """
+    for char, entity in (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;")):
+        column = func.replace(column, char, entity)
+    return column
+
+
+def prefix_tsquery(q: str) -> str:
+    """'ипот кред' -> 'ипот:* & кред:*' (поиск по мере набора); без слов - пустая строка"""
+    words = re.findall(r"\w+", q.lower())
+    return " & ".join(f"{word}:*" for word in words)
+
+
+@lru_cache(maxsize=None)
+def search_products(prefix: bool):
+    """Поиск по всем таблицам каталога одним UNION ALL с ранжированием и подсветкой
+
+    Каждая ветка берёт свои лучшие :limit строк по GIN-индексу, ts_headline
+    считается только для итоговых :limit строк.
+    """
+    q = bindparam("q", type_=String())
+    regconfig = literal_column("'russian'::regconfig")
+    tsquery = func.to_tsquery(regconfig, q) if prefix else func.websearch_to_tsquery(regconfig, q)
+    limit = bindparam("limit", type_=Integer())
+
+    branches = []
+    for table_name in SEARCH_TABLES:
+        table = get_table(table_name)
+        c = table.c
+        rank = func.ts_rank(c.search_tsv, tsquery)
+        branches.append(
+            select(
+                literal_column(f"'{table_name}'").label("section"),
+                c.id, c.name, c.rate, c.term,
+                (c.max_amount if table_name == "deposits" else c.amount).label("amount"),
+                c.details, c.advantage,
+                rank.label("rank"),
+            )
+            .where(c.search_tsv.op("@@")(tsquery))
+            .order_by(rank.desc())
+            .limit(limit)
+        )
+    hits = union_all(*branches).subquery("hits")
+    return (
+        select(
+            hits.c.section, hits.c.id, hits.c.name, hits.c.rate, hits.c.term, hits.c.amount, hits.c.advantage,
+            hits.c.rank,
+            func.ts_headline(regconfig, html_escape(hits.c.name), tsquery, HEADLINE_OPTIONS).label("name_highlight"),
+            func.ts_headline(regconfig, html_escape(hits.c.details), tsquery, HEADLINE_OPTIONS).label("details_highlight"),
+        )
+        .order_by(hits.c.rank.desc(), hits.c.section, hits.c.id)
+        .limit(limit)
+    )
+
+
+@lru_cache(maxsize=None)
+def select_advantage_facets():
+    """Каждое преимущество и число продуктов с ним, по разделам каталога
+
+    Строки, где advantage не массив (скаляр, объект), пропускаются:
+    jsonb_array_elements_text на них падает и роняет весь запрос.
+    """
+    values = union_all(*(
+        select(
+            literal_column(f"'{table_name}'").label("section"),
+            func.jsonb_array_elements_text(get_table(table_name).c.advantage).label("value"),
+        )
+        .where(func.jsonb_typeof(get_table(table_name).c.advantage) == "array")
+        for table_name in SEARCH_TABLES
+    )).subquery("advantages")
+    return (
+        select(values.c.section, values.c.value, func.count().label("count"))
+        .group_by(values.c.section, values.c.value)
+        .order_by(values.c.section, func.count().desc(), values.c.value)
+    )
+
+
+# ===========================================
+# ЗАЯВКИ
+# ===========================================
+
+@lru_cache(maxsize=None)
+def select_contacts(has_status: bool, has_telegram_id: bool, has_date_from: bool, has_date_to: bool,
+                    keyset: bool = False, newest_first: bool = True):
+    """SELECT заявок с нужным набором фильтров
+
+    Значения фильтров - bindparam, поэтому вариантов запроса конечное число
+    и каждый кэшируется.
+    """
+    c = contact_requests.c
+    stmt = select(*public_columns(contact_requests))
+    if has_status:
+        stmt = stmt.where(c.status == bindparam("status"))
+    if has_telegram_id:
+        stmt = stmt.where(c.telegram_id == bindparam("telegram_id"))
+    if has_date_from:
+        stmt = stmt.where(c.created_at >= bindparam("date_from"))
+    if has_date_to:
+        stmt = stmt.where(c.created_at < bindparam("date_to"))
+    if keyset:
+        # Страница после курсора: (created_at, id) < (cursor_created_at, cursor_id)
+        stmt = stmt.where(
+            tuple_(c.created_at, c.id) < tuple_(bindparam("cursor_created_at", type_=DateTime()), bindparam("cursor_id", type_=Integer()))
+        )
+    if newest_first:
+        stmt = stmt.order_by(c.created_at.desc(), c.id.desc()).limit(bindparam("limit"))
+    else:
+        stmt = stmt.order_by(c.created_at, c.id)
+    return stmt
+
+
+@lru_cache(maxsize=None)
+def select_contacts_json(has_status: bool, has_telegram_id: bool, has_date_from: bool, has_date_to: bool,
+                         keyset: bool = False):
+    """Страница заявок, собранная в JSON на стороне PostgreSQL
+
+    Внутренний запрос тот же, что у select_contacts (limit = page_size + 1).
+    Наружу: items - JSON-массив первых page_size строк, fetched - сколько
+    строк нашлось, last_created_at/last_id - позиция для следующего курсора.
+    """
+    c = contact_requests.c
+    page = (
+        select_contacts(has_status, has_telegram_id, has_date_from, has_date_to, keyset=keyset)
+        .add_columns(func.row_number().over(order_by=(c.created_at.desc(), c.id.desc())).label("rn"))
+        .subquery("page")
+    )
+    page_size = bindparam("page_size", type_=Integer())
+    columns = [column for column in page.c if column.name != "rn"]
+    return select(
+        json_array(json_object(columns), (page.c.rn,), page.c.rn <= page_size).label("items"),
+        func.count().label("fetched"),
+        func.max(page.c.created_at).filter(page.c.rn == page_size).label("last_created_at"),
+        func.max(page.c.id).filter(page.c.rn == page_size).label("last_id"),
+    )
+
+
+insert_contact = insert(contact_requests).returning(contact_requests.c.id)
+
+# Пакет заявок из очереди: executemany с RETURNING SQLAlchemy собирает в
+# многострочные INSERT ... VALUES; уже записанные ingest_uid пропускаются
+insert_contacts_batch = (
+    pg_insert(contact_requests)
+    .on_conflict_do_nothing(index_elements=[contact_requests.c.ingest_uid])
+    .returning(contact_requests.c.id)
+)
+
+# Дедупликация заявок между воркерами: блокировка на telegram_id до конца
+# транзакции, затем поиск заявки в окне (отдельным запросом - в READ COMMITTED
+# он видит всё, что закоммитили до получения блокировки)
+lock_contact_key = text("SELECT pg_advisory_xact_lock(:telegram_id)")
+
+select_recent_contact = text("""
+    SELECT id FROM contact_requests
+    WHERE telegram_id = :telegram_id
+      AND created_at >= LOCALTIMESTAMP - make_interval(secs => :window)
+    ORDER BY created_at DESC, id DESC
+    LIMIT 1
+""")
+
+# created_at - TIMESTAMP без зоны, поэтому сравниваем с LOCALTIMESTAMP
+contact_stats = text("""
+    SELECT
+        COALESCE(status, 'unknown') AS status,
+        COUNT(*) AS total,
+        COUNT(*) FILTER (WHERE created_at >= date_trunc('day', LOCALTIMESTAMP)) AS today,
+        COUNT(*) FILTER (WHERE created_at >= LOCALTIMESTAMP - INTERVAL '7 days') AS week,
+        MIN(created_at) AS oldest,
+        EXTRACT(EPOCH FROM LOCALTIMESTAMP - MIN(created_at)) AS oldest_age
+    FROM contact_requests
+    GROUP BY COALESCE(status, 'unknown')
+""")
@@ -0,0 +1,83 @@
+"""Ответы API на orjson и кэш уже сериализованных тел по ETag
+
+ETag каталога содержит версии таблиц, поэтому тело для одного ETag
+не меняется - его можно закодировать (и сжать) один раз и отдавать байтами.
+"""
+import gzip
+from collections import OrderedDict
+
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from config import settings
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON через orjson: быстрее json.dumps, datetime сериализует сам"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def accepts_encoding(accept_encoding: str | None, encoding: str) -> bool:
+    """Клиент принимает encoding (gzip, br) и не запретил его через q=0"""
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() == encoding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    return accepts_encoding(accept_encoding, "gzip")
+
+
+class EncodedBodies:
+    """Закодированные тела ответов по ETag (LRU): JSON и его gzip-вариант"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._bodies: OrderedDict[str, dict[str, bytes]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag: str, build) -> dict[str, bytes]:
+        """Варианты тела для ETag; build() вызывается только при промахе"""
+        variants = self._bodies.get(etag)
+        if variants is not None:
+            self.hits += 1
+            self._bodies.move_to_end(etag)
+            return variants
+        self.misses += 1
+        variants = {"identity": orjson.dumps(build(), option=orjson.OPT_NON_STR_KEYS)}
+        self._bodies[etag] = variants
+        while len(self._bodies) > self.max_entries:
+            self._bodies.popitem(last=False)
+        return variants
+
+    def gzip(self, variants: dict[str, bytes]) -> bytes:
+        """gzip-вариант тела (сжимается один раз и хранится рядом с JSON)"""
+        if "gzip" not in variants:
+            variants["gzip"] = gzip.compress(variants["identity"], compresslevel=6, mtime=0)
+        return variants["gzip"]
+
+    def clear(self):
+        self._bodies.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._bodies), "hits": self.hits, "misses": self.misses}
+
+
+encoded_bodies = EncodedBodies()
+
+
+def encoded_response(request: Request, etag: str, build) -> Response:
+    """Готовые байты для ETag (gzip, если клиент его принимает и тело не мелкое)"""
+    variants = encoded_bodies.get(etag, build)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    body = variants["identity"]
+    if len(body) >= settings.RESPONSE_GZIP_MIN_SIZE and accepts_gzip(request.headers.get("accept-encoding")):
+        body = encoded_bodies.gzip(variants)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,81 @@
+from datetime import datetime
+from typing import Annotated
+
+from pydantic import BaseModel, Field
+
+from calculator import MAX_TERM_MONTHS
+
+# Границы типов PostgreSQL: значение вне их БД отвергнет уже при записи
+INT4_MAX = 2**31 - 1
+BIGINT_MAX = 2**63 - 1
+
+
+# Строки отображения в таблицах каталога - VARCHAR(100) / VARCHAR(50)
+Name = Annotated[str, Field(max_length=100)]
+Label = Annotated[str, Field(max_length=50)]
+
+class LoanCreate(BaseModel):
+    name: Name
+    rate: Label
+    term: Label
+    amount: Label
+    advantage: list[str]
+    details: str
+
+class DepositCreate(BaseModel):
+    name: Name
+    rate: Label
+    term: Label
+    min_amount: Label
+    max_amount: Label
+    capitalization: Label = "Ежемесячно"
+    advantage: list[str]  # JSONB поле
+    details: str
+
+class ProductFilters(BaseModel):
+    """Фильтры списка продуктов по числовым колонкам (query-параметры)"""
+    max_rate: float | None = None
+    min_amount: float | None = None
+    term_months: int | None = None
+    advantage: list[str] | None = None  # все перечисленные преимущества (?advantage=..&advantage=..)
+    sort: str | None = None  # rate, amount, term; '-rate' - по убыванию
+
+    def is_set(self) -> bool:
+        return any(value is not None for value in self.model_dump().values())
+
+    def params(self) -> dict:
+        """Значения для bindparam (без sort и незаданных)"""
+        return {key: value for key, value in self.model_dump(exclude={"sort"}).items() if value is not None}
+
+class LoanCalculation(BaseModel):
+    """Запрос калькулятора: продукт (таблица + id) или явная ставка, суммы и сроки"""
+    product_table: str | None = None
+    product_id: int | None = None
+    rate: float | None = Field(None, ge=0, le=100)  # годовая ставка, %
+    amounts: list[Annotated[float, Field(gt=0)]] = []
+    terms: list[Annotated[int, Field(ge=1, le=MAX_TERM_MONTHS)]] = []  # месяцы
+    schedule: bool = False  # помесячные графики платежей
+
+class BulkDelete(BaseModel):
+    ids: list[Annotated[int, Field(ge=1, le=INT4_MAX)]]  # id - SERIAL (int4)
+
+class ContactRequest(BaseModel):
+    """Границы - как у колонок contact_requests (BIGINT, VARCHAR(255))"""
+    telegram_id: int = Field(ge=0, le=BIGINT_MAX)  # 0 - форма открыта не из Telegram
+    username: str = Field("", max_length=255)
+    first_name: str = Field("", max_length=255)
+    last_name: str = Field("", max_length=255)
+
+class ContactRequestImport(ContactRequest):
+    """Заявка из исторической выгрузки (импорт из файла)"""
+    created_at: datetime | None = None
+    status: str = Field("new", max_length=50)
+
+
+# Колонки таблиц в порядке INSERT/COPY
+LOAN_COLUMNS = ("name", "rate", "term", "amount", "advantage", "details")
+DEPOSIT_COLUMNS = ("name", "rate", "term", "min_amount", "max_amount", "capitalization", "advantage", "details")
+# Числовые колонки, вычисляемые из строк отображения (parsers.numeric_columns)
+LOAN_NUMERIC_COLUMNS = ("rate_pct", "term_months", "amount_max_byn")
+DEPOSIT_NUMERIC_COLUMNS = ("rate_pct", "term_months", "min_amount_byn", "max_amount_byn")
+CONTACT_COLUMNS = ("telegram_id", "username", "first_name", "last_name", "created_at", "status")